@@ -0,0 +1,43 @@
+from time import perf_counter
+
+import click
+from pandas import DataFrame
+
+from benchmarks.synthetic import EMPLOYEES_COUNT, make_survey_data
+from src.features.build_features import preprocess_categorical_features
+
+
+def legacy_preprocess_categorical_features(data: DataFrame) -> DataFrame:
+    data['Education'] = data['Education'].replace(list(range(1, 6)),
+                                                  ['Below College', 'College', 'Bachelor', 'Master', 'Doctor'])
+    data['WorkLifeBalance'] = data['WorkLifeBalance'].replace(list(range(1, 5)), ['Bad', 'Good', 'Better', 'Best'])
+
+    for column in ['EnvironmentSatisfaction', 'JobInvolvement', 'JobSatisfaction', 'PerformanceRating']:
+        data[column] = data[column].replace(list(range(1, 5)), ['Low', 'Medium', 'High', 'Very High'])
+    return data
+
+
+def measure(function, data: DataFrame) -> tuple[float, DataFrame]:
+    start = perf_counter()
+    result = function(data.copy())
+    return perf_counter() - start, result
+
+
+@click.command()
+@click.option('--scale', '-s', type=click.INT, multiple=True, default=[1, 10, 100])
+def main(scale: list[int]) -> None:
+    for factor in scale:
+        data = make_survey_data(EMPLOYEES_COUNT * factor)
+        legacy_time, legacy = measure(legacy_preprocess_categorical_features, data)
+        categorical_time, categorical = measure(preprocess_categorical_features, data)
+        assert categorical.astype(object).where(categorical.notna()).equals(legacy.where(legacy.notna())), \
+            'Categorical encoding should have the same labels as the legacy one'
+        legacy_memory = legacy.memory_usage(deep=True).sum() / 2 ** 20
+        categorical_memory = categorical.memory_usage(deep=True).sum() / 2 ** 20
+        click.echo(f'x{factor:<4} rows={len(data):<8} '
+                   f'legacy={legacy_time:6.3f}s {legacy_memory:8.2f}MiB '
+                   f'categorical={categorical_time:6.3f}s {categorical_memory:8.2f}MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import ast
+import subprocess
+import sys
+from pathlib import Path
+
+import click
+
+WEBAPP_PATH = Path(__file__).parent.parent / 'src' / 'webapp'
+
+
+def get_top_level_imports(path: Path) -> str:
+    tree = ast.parse(path.read_text(encoding='utf-8'))
+    return '\n'.join(ast.unparse(node) for node in tree.body if isinstance(node, ast.Import | ast.ImportFrom))
+
+
+def measure_imports(code: str) -> list[tuple[str, int, int]]:
+    """
+    Runs the imports in a fresh interpreter with -X importtime
+    :param code: import statements
+    :return: (module, self time, cumulative time) of every imported module, times are in microseconds,
+    names of nested imports are indented
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=WEBAPP_PATH,
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise click.ClickException(completed.stderr.strip().splitlines()[-1])
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative_time, name = line.removeprefix('import time:').split('|')
+        modules.append((name[1:].rstrip(), int(self_time), int(cumulative_time)))
+    return modules
+
+
+@click.command()
+@click.option('--top', '-t', type=click.INT, default=5)
+@click.option('--repeat', '-r', type=click.INT, default=3)
+def main(top: int, repeat: int) -> None:
+    interpreter_modules = {name for name, _, _ in measure_imports('pass')}
+    pages = [WEBAPP_PATH / 'app.py', *sorted((WEBAPP_PATH / 'pages').glob('[!_]*.py'))]
+    for page in pages:
+        runs = [[module for module in measure_imports(get_top_level_imports(page))
+                 if not module[0].startswith(' ') and module[0] not in interpreter_modules]
+                for _ in range(repeat)]
+        totals = [sum(cumulative for _, _, cumulative in modules) for modules in runs]
+        best = runs[totals.index(min(totals))]
+        click.echo(f'{page.relative_to(WEBAPP_PATH)}: {min(totals) / 1000:8.1f}ms (best of {repeat})')
+        for name, _, cumulative in sorted(best, key=lambda module: module[2], reverse=True)[:top]:
+            click.echo(f'    {name:<40} {cumulative / 1000:8.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+from time import perf_counter
+
+import click
+from pandas.testing import assert_frame_equal
+
+from benchmarks.synthetic import EMPLOYEES_COUNT, make_badge_times
+from src.features.build_features import get_sharded_working_time_statistics
+
+STATISTICS = ['mean', 'median', 'skew', 'std', 'p90', 'days-present', 'overtime-days']
+
+
+@click.command()
+@click.option('--scale', '-s', type=click.INT, default=10)
+@click.option('--workers', '-w', type=click.INT, multiple=True, default=[1, 2, 4, 8])
+def main(scale: int, workers: list[int]) -> None:
+    in_times, out_times = make_badge_times(EMPLOYEES_COUNT * scale)
+    click.echo(f'rows={len(in_times)} columns={len(in_times.columns)}')
+    baseline, baseline_time = None, None
+    for workers_count in workers:
+        start = perf_counter()
+        result = get_sharded_working_time_statistics([(in_times.copy(), out_times.copy())], workers_count,
+                                                     statistics=STATISTICS)
+        elapsed = perf_counter() - start
+        if baseline is None:
+            baseline, baseline_time = result, elapsed
+        assert_frame_equal(result, baseline, check_exact=True)
+        click.echo(f'workers={workers_count:<3} time={elapsed:8.2f}s speedup={baseline_time / elapsed:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+from time import perf_counter
+
+import click
+import numpy as np
+from pandas import DataFrame
+
+from src.webapp.dataset_io import read_dataset
+from src.webapp.scoring import RowPredictor, load_model, predict_attrition, prepare_features
+
+
+def measure(function, rows: list[dict]) -> np.ndarray:
+    latencies = []
+    for row in rows:
+        start = perf_counter()
+        function(row)
+        latencies.append(perf_counter() - start)
+    return 1000 * np.array(latencies)
+
+
+@click.command()
+@click.option('--model-path', '-m', type=click.Path(exists=True), default='models/CatBoostClassifier.pkl')
+@click.option('--data-path', '-d', type=click.Path(exists=True), default='data/interim/data.csv')
+@click.option('--rows', '-r', type=click.INT, default=1000)
+def main(model_path: str, data_path: str, rows: int) -> None:
+    model = load_model(model_path)
+    data = read_dataset(data_path)
+    features = prepare_features(data, data.columns)
+    sample = features.sample(rows, replace=True, random_state=0)
+    # the page builds the frame from a dict of one-element lists
+    records = [{col: [value] for col, value in row.items()} for row in sample.to_dict(orient='records')]
+    predictor = RowPredictor(model, data.columns)
+
+    pipeline_latencies = measure(lambda row: predict_attrition(model, DataFrame(row))[0], records)
+    predictor_latencies = measure(lambda row: predictor.predict({col: values[0] for col, values in row.items()}),
+                                  records)
+    expected = [predict_attrition(model, DataFrame(row))[0] for row in records[:100]]
+    actual = [predictor.predict({col: values[0] for col, values in row.items()}) for row in records[:100]]
+    assert np.allclose(expected, actual), 'Row predictor should match the pipeline'
+
+    for name, latencies in [('pipeline', pipeline_latencies), ('row predictor', predictor_latencies)]:
+        p50, p99 = np.percentile(latencies, [50, 99])
+        click.echo(f'{name:<14} p50={p50:7.3f}ms p99={p99:7.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
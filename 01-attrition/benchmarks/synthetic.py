@@ -0,0 +1,53 @@
+from numpy import nan
+from numpy.random import default_rng
+from pandas import DataFrame, date_range, to_timedelta
+
+EMPLOYEES_COUNT = 4410
+DAYS = date_range('2015-01-01', '2015-12-31', freq='B')
+HOLIDAYS_SHARE = 0.05
+ABSENCE_SHARE = 0.05
+
+
+def make_badge_times(employees_count: int = EMPLOYEES_COUNT, seed: int = 0) -> tuple[DataFrame, DataFrame]:
+    """
+    Generates in/out times dataframes shaped like the raw in_time.csv/out_time.csv files
+    :param employees_count: number of employees (rows)
+    :param seed: random seed
+    :return: raw in times and out times dataframes with string cells
+    """
+    rng = default_rng(seed)
+    shape = (employees_count, len(DAYS))
+    start = rng.normal(10 * 3600, 1800, size=shape).astype('int64')
+    duration = rng.normal(7.5 * 3600, 3600, size=shape).astype('int64')
+    missing = (rng.random(shape) < ABSENCE_SHARE) | (rng.random(len(DAYS)) < HOLIDAYS_SHARE)
+
+    days = DAYS.to_numpy().reshape(1, -1)
+    frames = []
+    for seconds in [start, start + duration]:
+        stamps = DataFrame(days + to_timedelta(seconds.ravel(), unit='s').to_numpy().reshape(shape),
+                           columns=DAYS.strftime('%Y-%m-%d'))
+        stamps = stamps.apply(lambda column: column.dt.strftime('%Y-%m-%d %H:%M:%S')).astype(object)
+        stamps[missing] = nan
+        stamps.insert(0, 'Unnamed: 0', range(1, employees_count + 1))
+        frames.append(stamps)
+    return frames[0], frames[1]
+
+
+def make_survey_data(employees_count: int = EMPLOYEES_COUNT, seed: int = 0) -> DataFrame:
+    """
+    Generates dataframe with the ordinal survey columns shaped like the joined general and survey data
+    :param employees_count: number of employees (rows)
+    :param seed: random seed
+    :return: dataframe with integer levels, EnvironmentSatisfaction has missing values
+    """
+    rng = default_rng(seed)
+    data = DataFrame({
+        'Education': rng.integers(1, 6, employees_count),
+        'WorkLifeBalance': rng.integers(1, 5, employees_count),
+        'EnvironmentSatisfaction': rng.integers(1, 5, employees_count).astype('float64'),
+        'JobInvolvement': rng.integers(1, 5, employees_count),
+        'JobSatisfaction': rng.integers(1, 5, employees_count),
+        'PerformanceRating': rng.integers(3, 5, employees_count),
+    }, index=range(1, employees_count + 1))
+    data.loc[rng.random(employees_count) < ABSENCE_SHARE, 'EnvironmentSatisfaction'] = nan
+    return data
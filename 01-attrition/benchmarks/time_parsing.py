@@ -0,0 +1,42 @@
+from time import perf_counter
+
+import click
+from numpy import nan
+from numpy.testing import assert_array_equal
+from pandas import DataFrame, to_datetime
+
+from benchmarks.synthetic import EMPLOYEES_COUNT, make_badge_times
+from src.features.build_features import SECONDS_IN_HOUR, preprocess_time_dataframe
+
+
+def legacy_preprocess_time_dataframe(times: DataFrame) -> DataFrame:
+    times[times == 'NA'] = nan
+    for column in times.columns[1:]:
+        times[column] = to_datetime(times[column]).map(
+            lambda x: x if x is None else (x - x.replace(hour=0, minute=0, second=0)).total_seconds() / SECONDS_IN_HOUR)
+    return times
+
+
+def measure(function, times: DataFrame) -> tuple[float, DataFrame]:
+    start = perf_counter()
+    result = function(times.copy())
+    return perf_counter() - start, result
+
+
+@click.command()
+@click.option('--scale', '-s', type=click.INT, multiple=True, default=[1, 10, 100])
+@click.option('--legacy-max-scale', type=click.INT, default=100, help='Skip the per-cell implementation above it')
+def main(scale: list[int], legacy_max_scale: int) -> None:
+    for factor in scale:
+        times, _ = make_badge_times(EMPLOYEES_COUNT * factor)
+        vectorized_time, vectorized = measure(preprocess_time_dataframe, times)
+        line = f'x{factor:<4} rows={len(times):<8} vectorized={vectorized_time:8.2f}s'
+        if factor <= legacy_max_scale:
+            legacy_time, legacy = measure(legacy_preprocess_time_dataframe, times)
+            assert_array_equal(vectorized.to_numpy(dtype=float), legacy.to_numpy(dtype=float))
+            line += f' legacy={legacy_time:8.2f}s speedup={legacy_time / vectorized_time:6.1f}x'
+        click.echo(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,12 @@
 python -m pip install -e . --force-reinstall
 mkdir data/interim
 build-features data/raw data/interim/data.csv mean median skew
+rem the model is trained in notebooks/5.0-gaa-models.ipynb, the webapp image needs its artifact and SHAP values
+if exist models\CatBoostClassifier.pkl (
+    export-model models/CatBoostClassifier.pkl data/interim/data.csv models/CatBoostClassifier
+    explain-dataset models/CatBoostClassifier data/interim/data.csv models/CatBoostClassifier.shap.parquet
+) else (
+    echo models/CatBoostClassifier.pkl not found, run notebooks/5.0-gaa-models.ipynb to train the model
+)
 echo Done
 exit /b
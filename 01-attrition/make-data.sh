@@ -1,4 +1,11 @@
 python -m pip install -e . --force-reinstall
 build-features data/raw data/interim/data.csv mean median skew
+# the model is trained in notebooks/5.0-gaa-models.ipynb, the webapp image needs its artifact and SHAP values
+if [ -f models/CatBoostClassifier.pkl ]; then
+    export-model models/CatBoostClassifier.pkl data/interim/data.csv models/CatBoostClassifier
+    explain-dataset models/CatBoostClassifier data/interim/data.csv models/CatBoostClassifier.shap.parquet
+else
+    echo models/CatBoostClassifier.pkl not found, run notebooks/5.0-gaa-models.ipynb to train the model
+fi
 echo Done
 exit 0
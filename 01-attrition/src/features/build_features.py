@@ -1,77 +1,255 @@
-from collections.abc import Generator
+from collections.abc import Generator, Iterable
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 
 import click
-from numpy import nan
-from pandas import read_csv, DataFrame, Series, to_datetime, to_numeric
+from numpy import float32, linspace, nan, where
+from pandas import read_csv, concat, Categorical, CategoricalDtype, DataFrame, Index, to_datetime, to_numeric
+from pandas.api.types import is_float_dtype, is_integer_dtype, is_object_dtype
+
+from src.webapp.dataset_io import ORDINAL_LEVELS
+
+from .cache import StageCache
+from .working_time import OVERTIME_HOURS, get_statistic_column, reduce_working_time
 
 SECONDS_IN_HOUR = 3600
+NANOSECONDS_IN_SECOND = 10 ** 9
+NANOSECONDS_IN_DAY = 24 * SECONDS_IN_HOUR * NANOSECONDS_IN_SECOND
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+OUTPUT_FORMATS = ['.csv', '.parquet', '.feather', '.arrow']
+# bump when results of cached stages change
+CACHE_VERSION = 2
 
 
 def preprocess_categorical_features(data: DataFrame) -> DataFrame:
-    data['Education'] = data['Education'].replace(list(range(1, 6)),
-                                                  ['Below College', 'College', 'Bachelor', 'Master', 'Doctor'])
-    data['WorkLifeBalance'] = data['WorkLifeBalance'].replace(list(range(1, 5)), ['Bad', 'Good', 'Better', 'Best'])
-
-    for column in ['EnvironmentSatisfaction', 'JobInvolvement', 'JobSatisfaction', 'PerformanceRating']:
-        data[column] = data[column].replace(list(range(1, 5)), ['Low', 'Medium', 'High', 'Very High'])
+    """
+    Converts ordinal integer columns (1 is the lowest level) to ordered categorical columns, NA values are kept
+    :param data: dataframe with ordinal columns, see ORDINAL_LEVELS
+    :return: preprocessed dataframe
+    """
+    for column, levels in ORDINAL_LEVELS.items():
+        values = data[column]
+        assert values.dropna().isin(range(1, len(levels) + 1)).all(), \
+            f'{column} values should be in range from 1 to {len(levels)}'
+        codes = values.fillna(0).astype('int8') - 1
+        data[column] = Categorical.from_codes(codes, dtype=CategoricalDtype(levels, ordered=True))
     return data
 
 
-def preprocess_time_dataframe(times: DataFrame) -> DataFrame:
+def preprocess_time_dataframe(times: DataFrame, time_format: str = TIME_FORMAT) -> DataFrame:
     """
-    Preprocesses the dataframe: replaces NA with None and converts all dates to time in seconds format
+    Preprocesses the dataframe: replaces NA with None and converts all dates to time in hours format.
+    All the cells are parsed at once and time of day is taken from the integer nanoseconds representation
     :param times: input dataframe with in/out times
+    :param time_format: format of the dates in the dataframe
     :return: preprocessed dataframe
     """
 
     times[times == 'NA'] = nan
-    for column in times.columns[1:]:
-        times[column] = to_datetime(times[column]).map(
-            lambda x: x if x is None else (x - x.replace(hour=0, minute=0, second=0)).total_seconds() / SECONDS_IN_HOUR)
+    columns = times.columns[1:]
+    values = times[columns].to_numpy(dtype=object).ravel()
+    parsed = to_datetime(values, format=time_format)
+    nanoseconds = parsed.asi8 % NANOSECONDS_IN_DAY
+    hours = where(parsed.isna(), nan, nanoseconds / NANOSECONDS_IN_SECOND / SECONDS_IN_HOUR)
+    times[columns] = hours.reshape(len(times), len(columns))
 
     return times
 
 
 def get_working_time_statistics(in_times_: DataFrame, out_times_: DataFrame, id_column: str = 'EmployeeID',
-                                statistics: list[str] | None = None) -> Generator[Series, None, None]:
+                                statistics: list[str] | None = None,
+                                overtime_hours: float = OVERTIME_HOURS) -> DataFrame:
     """
-    Calculates named statistics for working time
+    Calculates named statistics for working time in a single pass over float32 working time matrix
     :param in_times_: dataframe with working day start times
     :param out_times_: dataframe with working day end times
-    :param statistics: statistics to calculate, should be methods of pandas.DataFrame and should result in Series object
-    :return: Generator yielding series with given statistics
+    :param statistics: statistics to calculate, see working_time.reduce_working_time
+    :param overtime_hours: working time after which the day is counted as an overtime day
+    :return: dataframe with given statistics indexed by id column
     """
 
     assert (in_times_.index == out_times_.index).all(), 'in_times and out_times index should match'
     assert (in_times_.columns == out_times_.columns).all(), 'in_times columns and out_times should be equal'
 
-    if statistics is None:
-        statistics = ['mean', 'median', 'skew']
-
     relevant_columns = in_times_.columns[1:]
-    working_time = out_times_[relevant_columns] - in_times_[relevant_columns]
+    working_time = out_times_[relevant_columns].to_numpy(dtype=float32) \
+        - in_times_[relevant_columns].to_numpy(dtype=float32)
+    statistics = reduce_working_time(working_time, statistics, overtime_hours)
+    return DataFrame({get_statistic_column(name): values for name, values in statistics.items()},
+                     index=Index(in_times_[in_times_.columns[0]], name=id_column))
+
+
+def process_time_shard(in_times_: DataFrame, out_times_: DataFrame, id_column: str = 'EmployeeID',
+                       statistics: list[str] | None = None,
+                       overtime_hours: float = OVERTIME_HOURS, parsed: bool = False) -> DataFrame:
+    """
+    Parses in and out times of a shard of employees and calculates working time statistics for it
+    :param in_times_: dataframe with working day start times
+    :param out_times_: dataframe with working day end times
+    :param statistics: statistics to calculate, see working_time.reduce_working_time
+    :param overtime_hours: working time after which the day is counted as an overtime day
+    :param parsed: whether the times are already preprocessed by preprocess_time_dataframe
+    :return: dataframe with given statistics indexed by id column
+    """
+    if not parsed:
+        in_times_ = preprocess_time_dataframe(in_times_)
+        out_times_ = preprocess_time_dataframe(out_times_)
+    return get_working_time_statistics(in_times_, out_times_, id_column, statistics, overtime_hours)
+
+
+def read_time_chunks(in_times_path: Path, out_times_path: Path,
+                     chunksize: int) -> Generator[tuple[DataFrame, DataFrame], None, None]:
+    """
+    Reads in and out times files by matching chunks of rows, so only a chunk of the time dataframes is kept in memory
+    :param in_times_path: path to the csv file with working day start times
+    :param out_times_path: path to the csv file with working day end times
+    :param chunksize: number of rows in a chunk
+    :return: Generator yielding raw in and out times chunks
+    """
+    with read_csv(in_times_path, chunksize=chunksize) as in_reader, \
+         read_csv(out_times_path, chunksize=chunksize) as out_reader:
+        yield from zip(in_reader, out_reader, strict=True)
+
+
+def split_into_shards(df: DataFrame, shards: int) -> list[DataFrame]:
+    bounds = linspace(0, len(df), shards + 1).astype('int64')
+    return [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def read_time_dataframe(path: Path, workers: int = 1) -> DataFrame:
+    """
+    Reads and preprocesses in or out times file, parsing is split into shards of employees across workers
+    :param path: path to the csv file with in or out times
+    :param workers: number of worker processes, the file is parsed in the current process if 1
+    :return: preprocessed dataframe
+    """
+    times = read_csv(path)
+    if workers == 1:
+        return preprocess_time_dataframe(times)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return concat(executor.map(preprocess_time_dataframe, split_into_shards(times, workers)))
 
-    for statistic_name in statistics:
-        assert hasattr(working_time, statistic_name), \
-            f'Statistic {statistic_name} can not be calculated for the dataframe, ensure dataframe has this method'
-        statistic = getattr(working_time, statistic_name)(axis=1)
-        assert isinstance(statistic, Series), f'dataframe.{statistic_name}() should be a series object'
-        statistic.name = statistic_name.capitalize() + 'WorkingTime'
-        statistic[id_column] = in_times_.index
-        yield to_numeric(statistic, errors='coerce')
+
+def get_sharded_working_time_statistics(time_chunks: Iterable[tuple[DataFrame, DataFrame]], workers: int = 1,
+                                        id_column: str = 'EmployeeID',
+                                        statistics: list[str] | None = None,
+                                        overtime_hours: float = OVERTIME_HOURS,
+                                        parsed: bool = False) -> DataFrame:
+    """
+    Calculates named statistics for working time chunk by chunk. Each chunk is split into contiguous shards of
+    employees processed by a pool of workers, results are concatenated in the input order,
+    so they do not depend on chunk size and number of workers
+    :param time_chunks: in and out times chunks, see read_time_chunks
+    :param workers: number of worker processes, chunks are processed in the current process if 1
+    :param statistics: statistics to calculate, see working_time.reduce_working_time
+    :param overtime_hours: working time after which the day is counted as an overtime day
+    :param parsed: whether the times are already preprocessed by preprocess_time_dataframe
+    :return: dataframe with given statistics indexed by id column
+    """
+
+    process = partial(process_time_shard, id_column=id_column, statistics=statistics,
+                      overtime_hours=overtime_hours, parsed=parsed)
+    if workers == 1:
+        return concat([process(in_chunk, out_chunk) for in_chunk, out_chunk in time_chunks])
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for in_chunk, out_chunk in time_chunks:
+            results.extend(executor.map(process, split_into_shards(in_chunk, workers),
+                                        split_into_shards(out_chunk, workers)))
+    return concat(results)
 
 
 def log(message: str) -> None:
     click.echo(f'[{datetime.now():%H:%M:%S}] {message}')
 
 
+def compact_dtypes(data: DataFrame) -> DataFrame:
+    """
+    Stores string columns as categorical ones and downcasts numeric columns to the smallest suitable dtype
+    :param data: dataframe to compact
+    :return: compacted dataframe
+    """
+    for column in data.columns:
+        if is_object_dtype(data[column]):
+            data[column] = data[column].astype('category')
+        elif is_integer_dtype(data[column]):
+            data[column] = to_numeric(data[column], downcast='integer')
+        elif is_float_dtype(data[column]):
+            data[column] = to_numeric(data[column], downcast='float')
+    return data
+
+
+def save_data(data: DataFrame, output_path: Path) -> None:
+    """
+    Saves the data in the format given by output path suffix. Parquet and Arrow IPC (feather) files are saved with
+    compacted dtypes, so categorical columns are dictionary encoded. Arrow IPC (feather) files are not compressed,
+    so they can be memory-mapped, and the index is saved as a column as they can not store it
+    :param data: dataframe to save
+    :param output_path: path to .csv, .parquet, .feather or .arrow file
+    """
+    if output_path.suffix == '.csv':
+        data.to_csv(output_path)
+        return
+    data = compact_dtypes(data)
+    if output_path.suffix == '.parquet':
+        data.to_parquet(output_path)
+    else:
+        data.reset_index().to_feather(output_path, compression='uncompressed')
+
+
 def validate_file(raw_data_dir: Path, filename: str) -> None:
     assert filename.endswith('.csv'), f'{filename} file must be .csv file'
     assert (raw_data_dir / filename).exists(), f'{raw_data_dir / filename} must exist'
 
 
+def read_survey_data(general_data_path: Path, mngr_surv_data_path: Path, empl_surv_data_path: Path,
+                     id_column: str = 'EmployeeID') -> DataFrame:
+    """
+    Reads general data and survey data, joins them by id column and preprocesses categorical features
+    :param general_data_path: path to the csv file with general data
+    :param mngr_surv_data_path: path to the csv file with manager survey data
+    :param empl_surv_data_path: path to the csv file with employee survey data
+    :return: joined dataframe indexed by id column
+    """
+    general_data = read_csv(general_data_path)
+    manager_survey_data = read_csv(mngr_surv_data_path)
+    employee_survey_data = read_csv(empl_surv_data_path)
+    for df in [general_data, manager_survey_data, employee_survey_data]:
+        assert id_column in df.columns, f'Id column {id_column} should be in all dataframes except time ones'
+    general_data.set_index(id_column, inplace=True)
+    manager_survey_data.set_index(id_column, inplace=True)
+    employee_survey_data.set_index(id_column, inplace=True)
+    data = general_data \
+        .join(manager_survey_data, on=id_column, how='left', lsuffix='', rsuffix='_r') \
+        .join(employee_survey_data, on=id_column, how='left', lsuffix='', rsuffix='_r')
+    return preprocess_categorical_features(data)
+
+
+def compute_working_time_statistics(cache: StageCache, in_times_path: Path, out_times_path: Path,
+                                    chunksize: int | None, workers: int, id_column: str,
+                                    statistics: list[str], overtime_hours: float) -> DataFrame:
+    """
+    Calculates working time statistics streaming the time files if chunksize is given,
+    otherwise parsed in and out times are taken from the cache or parsed and cached
+    :return: dataframe with given statistics indexed by id column
+    """
+    if chunksize is not None:
+        log(f'Streaming in/out times by {chunksize} rows')
+        return get_sharded_working_time_statistics(read_time_chunks(in_times_path, out_times_path, chunksize),
+                                                   workers, id_column, statistics, overtime_hours)
+    in_times_, out_times_ = [
+        cache.get_or_compute(f'parsed {path.name}',
+                             cache.make_key('times', CACHE_VERSION, TIME_FORMAT, cache.hash_file(path)),
+                             partial(read_time_dataframe, path, workers))
+        for path in [in_times_path, out_times_path]
+    ]
+    return get_sharded_working_time_statistics([(in_times_, out_times_)], workers, id_column, statistics,
+                                               overtime_hours, parsed=True)
+
+
 @click.command()
 @click.argument('raw_data_dir', type=click.Path(exists=True), required=True)
 @click.argument('output_path', type=click.Path(), required=True)
@@ -82,35 +260,50 @@ def validate_file(raw_data_dir: Path, filename: str) -> None:
 @click.option('--in-times', '-it', type=click.STRING, default='in_time.csv')
 @click.option('--out-times', '-ot', type=click.STRING, default='out_time.csv')
 @click.option('--id-column', '-id', type=click.STRING, default='EmployeeID')
+@click.option('--chunksize', '-cs', type=click.IntRange(min=1), default=None)
+@click.option('--overtime-hours', '-oh', type=click.FLOAT, default=OVERTIME_HOURS)
+@click.option('--workers', '-w', type=click.IntRange(min=1), default=1)
+@click.option('--cache-dir', type=click.Path(), default='data/cache')
+@click.option('--no-cache', is_flag=True, default=False)
 def main(raw_data_dir: str, output_path: str, statistics: list[str],
          general_data: str, empl_surv_data: str,
-         mngr_surv_data: str, in_times: str, out_times: str, id_column: str) -> None:
+         mngr_surv_data: str, in_times: str, out_times: str, id_column: str,
+         chunksize: int | None, overtime_hours: float, workers: int,
+         cache_dir: str, no_cache: bool) -> None:
     raw_data_dir = Path(raw_data_dir)
     output_path = Path(output_path)
+    assert output_path.suffix in OUTPUT_FORMATS, f'{output_path} file must be one of {OUTPUT_FORMATS} files'
     for file in [general_data, empl_surv_data, mngr_surv_data, in_times, out_times]:
         validate_file(raw_data_dir, file)
+    cache = StageCache(Path(cache_dir), enabled=not no_cache, log=log)
+    if no_cache:
+        log('Cache is disabled')
+
+    log('Reading and preprocessing survey data')
+    survey_paths = [raw_data_dir / general_data, raw_data_dir / mngr_surv_data, raw_data_dir / empl_surv_data]
+    data = cache.get_or_compute('survey data',
+                                cache.make_key('survey', CACHE_VERSION, id_column,
+                                               *map(cache.hash_file, survey_paths)),
+                                partial(read_survey_data, *survey_paths, id_column))
 
-    log('Reading raw data')
-    general_data = read_csv(raw_data_dir / general_data)
-    manager_survey_data = read_csv(raw_data_dir / mngr_surv_data)
-    employee_survey_data = read_csv(raw_data_dir / empl_surv_data)
-    for df in [general_data, manager_survey_data, employee_survey_data]:
-        assert id_column in df.columns, f'Id column {id_column} should be in all dataframes except time ones'
-    in_times = read_csv(raw_data_dir / in_times)
-    out_times = read_csv(raw_data_dir / out_times)
-    log('Data is loaded. Preprocessing the data')
-    in_times = preprocess_time_dataframe(in_times)
-    out_times = preprocess_time_dataframe(out_times)
-    general_data.set_index(id_column, inplace=True)
-    manager_survey_data.set_index(id_column, inplace=True)
-    employee_survey_data.set_index(id_column, inplace=True)
-    data = general_data \
-        .join(manager_survey_data, on=id_column, how='left', lsuffix='', rsuffix='_r') \
-        .join(employee_survey_data, on=id_column, how='left', lsuffix='', rsuffix='_r')
-    data = preprocess_categorical_features(data)
     log('Adding features')
-    for statistic in get_working_time_statistics(in_times, out_times, id_column, statistics):
-        data = data.join(statistic, on=id_column, how='left')
+    if workers > 1:
+        log(f'Processing in/out times with {workers} workers')
+    in_times, out_times = raw_data_dir / in_times, raw_data_dir / out_times
+    statistic_keys = {
+        name: cache.make_key('statistic', CACHE_VERSION, id_column, cache.hash_file(in_times),
+                             cache.hash_file(out_times), name, overtime_hours if name == 'overtime-days' else None)
+        for name in statistics
+    }
+    columns = {name: cache.load(f'{name} statistic', key) for name, key in statistic_keys.items()}
+    stale = [name for name, column in columns.items() if column is None]
+    if stale:
+        computed = compute_working_time_statistics(cache, in_times, out_times, chunksize, workers, id_column,
+                                                   stale, overtime_hours)
+        for name in stale:
+            columns[name] = computed[[get_statistic_column(name)]]
+            cache.save(statistic_keys[name], columns[name])
+    data = data.join(concat(columns.values(), axis=1), on=id_column, how='left')
     data = data.drop(columns=['Over18', 'EmployeeCount', 'StandardHours'])
     log('Saving the data')
-    data.to_csv(output_path)
+    save_data(data, output_path)
@@ -0,0 +1,65 @@
+import hashlib
+from collections.abc import Callable
+from pathlib import Path
+
+from pandas import DataFrame, read_pickle
+
+
+class StageCache:
+    """
+    On-disk cache of build-features stages. Entries are pickled dataframes stored under a key built
+    from hashes of the stage inputs and parameters, so stale entries are never read
+    """
+
+    def __init__(self, directory: Path, enabled: bool = True, log: Callable[[str], None] = print) -> None:
+        self.directory = directory
+        self.enabled = enabled
+        self.log = log
+        self._file_hashes = {}
+
+    def hash_file(self, path: Path) -> str:
+        if not self.enabled:
+            return ''
+        if path not in self._file_hashes:
+            with open(path, 'rb') as file:
+                self._file_hashes[path] = hashlib.file_digest(file, 'sha256').hexdigest()
+        return self._file_hashes[path]
+
+    @staticmethod
+    def make_key(stage: str, *parts: object) -> str:
+        digest = hashlib.sha256(repr(parts).encode()).hexdigest()
+        return f'{stage}-{digest[:32]}'
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}.pkl'
+
+    def load(self, stage: str, key: str) -> DataFrame | None:
+        if not self.enabled:
+            return None
+        if not self._path(key).exists():
+            self.log(f'Cache miss: {stage}')
+            return None
+        self.log(f'Cache hit: {stage}')
+        return read_pickle(self._path(key))
+
+    def save(self, key: str, data: DataFrame) -> None:
+        if not self.enabled:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary_path = self._path(key).with_suffix('.tmp')
+        data.to_pickle(temporary_path)
+        temporary_path.replace(self._path(key))
+
+    def get_or_compute(self, stage: str, key: str, compute: Callable[[], DataFrame]) -> DataFrame:
+        """
+        Loads the stage result from the cache or computes and stores it
+        :param stage: human-readable stage name used for logging
+        :param key: cache key, see make_key
+        :param compute: function computing the stage result
+        :return: stage result
+        """
+        data = self.load(stage, key)
+        if data is None:
+            data = compute()
+            self.save(key, data)
+        return data
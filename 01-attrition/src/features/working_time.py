@@ -0,0 +1,130 @@
+import re
+
+from numpy import arange, ceil, errstate, float64, floor, isnan, nan, ndarray, sort, sqrt, where
+
+MOMENT_ORDERS = {
+    'sum': 1,
+    'mean': 1,
+    'var': 2,
+    'std': 2,
+    'skew': 3,
+    'kurt': 4,
+}
+ORDER_STATISTICS = {
+    'min': 0.0,
+    'median': 0.5,
+    'max': 1.0,
+}
+COUNT_STATISTICS = {
+    'days-present': 'DaysPresent',
+    'overtime-days': 'OvertimeDays',
+}
+QUANTILE_PATTERN = re.compile(r'p(\d{1,2})')
+DEFAULT_STATISTICS = ['mean', 'median', 'skew']
+OVERTIME_HOURS = 8
+FLOATING_POINT_ERROR = 1e-14
+
+
+def get_quantile(statistic_name: str) -> float | None:
+    """
+    Returns quantile for order statistics (min, median, max and pXX percentiles)
+    :param statistic_name: name of the statistic
+    :return: quantile in [0, 1] or None if statistic is not an order statistic
+    """
+    if statistic_name in ORDER_STATISTICS:
+        return ORDER_STATISTICS[statistic_name]
+    match = QUANTILE_PATTERN.fullmatch(statistic_name)
+    return None if match is None else int(match[1]) / 100
+
+
+def is_supported(statistic_name: str) -> bool:
+    return statistic_name in MOMENT_ORDERS or statistic_name in COUNT_STATISTICS \
+        or get_quantile(statistic_name) is not None
+
+
+def get_statistic_column(statistic_name: str) -> str:
+    if statistic_name in COUNT_STATISTICS:
+        return COUNT_STATISTICS[statistic_name]
+    return statistic_name.capitalize() + 'WorkingTime'
+
+
+def _zero_out_fperr(values: ndarray) -> ndarray:
+    return where(abs(values) < FLOATING_POINT_ERROR, 0, values)
+
+
+def _reduce_moments(working_time: ndarray, missing: ndarray, count: ndarray,
+                    statistics: list[str]) -> dict[str, ndarray]:
+    order = max(MOMENT_ORDERS.get(name, 0) for name in statistics)
+    if order == 0:
+        return {}
+
+    total = where(missing, 0, working_time).sum(axis=1, dtype=float64)
+    mean = total / count
+    adjusted = where(missing, 0, working_time - mean[:, None])
+    squared = adjusted ** 2
+    m2 = squared.sum(axis=1)
+    m3 = (squared * adjusted).sum(axis=1) if order >= 3 else None
+    m4 = (squared ** 2).sum(axis=1) if order >= 4 else None
+
+    results = {'sum': total, 'mean': mean}
+    if order >= 2:
+        results['var'] = where(count > 1, m2 / (count - 1), nan)
+        results['std'] = sqrt(results['var'])
+    if order >= 3:
+        m2, m3 = _zero_out_fperr(m2), _zero_out_fperr(m3)
+        skew = (count * (count - 1) ** 0.5 / (count - 2)) * (m3 / m2 ** 1.5)
+        results['skew'] = where(count < 3, nan, where(m2 == 0, 0, skew))
+    if order >= 4:
+        adjustment = 3 * (count - 1) ** 2 / ((count - 2) * (count - 3))
+        numerator = _zero_out_fperr(count * (count + 1) * (count - 1) * m4)
+        denominator = _zero_out_fperr((count - 2) * (count - 3) * m2 ** 2)
+        kurt = numerator / denominator - adjustment
+        results['kurt'] = where(count < 4, nan, where(denominator == 0, 0, kurt))
+    return results
+
+
+def _reduce_order_statistics(working_time: ndarray, count: ndarray, statistics: list[str]) -> dict[str, ndarray]:
+    quantiles = {name: get_quantile(name) for name in statistics if get_quantile(name) is not None}
+    if not quantiles:
+        return {}
+
+    ordered = sort(working_time, axis=1)
+    rows = arange(len(ordered))
+    results = {}
+    for name, quantile in quantiles.items():
+        position = quantile * (count - 1)
+        lower = floor(position).clip(min=0).astype('int64')
+        upper = ceil(position).clip(min=0).astype('int64')
+        low = ordered[rows, lower].astype(float64)
+        high = ordered[rows, upper].astype(float64)
+        results[name] = where(count == 0, nan, low + (high - low) * (position - lower))
+    return results
+
+
+def reduce_working_time(working_time: ndarray, statistics: list[str] | None = None,
+                        overtime_hours: float = OVERTIME_HOURS) -> dict[str, ndarray]:
+    """
+    Calculates row-wise statistics of the working time matrix in one pass: moments are shared by
+    sum/mean/var/std/skew/kurt and order statistics (min, median, max, pXX) are taken from one row-wise sort.
+    NaN values are skipped, statistics match the ones of pandas.DataFrame
+    :param working_time: contiguous 2D matrix with working time in hours, NaN for missing days
+    :param statistics: statistics to calculate
+    :param overtime_hours: working time after which the day is counted as an overtime day
+    :return: dictionary with statistic name as a key and array of row values as a value
+    """
+
+    if statistics is None:
+        statistics = DEFAULT_STATISTICS
+    for statistic_name in statistics:
+        assert is_supported(statistic_name), \
+            f'Statistic {statistic_name} is not supported, use one of {list(MOMENT_ORDERS)}, ' \
+            f'{list(ORDER_STATISTICS)}, {list(COUNT_STATISTICS)} or pXX percentiles'
+
+    missing = isnan(working_time)
+    count = working_time.shape[1] - missing.sum(axis=1)
+    with errstate(invalid='ignore', divide='ignore'):
+        results = _reduce_moments(working_time, missing, count, statistics) \
+            | _reduce_order_statistics(working_time, count, statistics)
+    results['days-present'] = count
+    results['overtime-days'] = (working_time > overtime_hours).sum(axis=1)
+    return {name: results[name] for name in statistics}
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import click
+
+from src.webapp.dataset_io import read_dataset
+from src.webapp.explanations import compute_reference_shap_values, save_reference_shap_values
+from src.webapp.scoring import TARGET, get_model_fingerprint, load_model
+
+
+def log(message: str) -> None:
+    click.echo(f'[{datetime.now():%H:%M:%S}] {message}')
+
+
+@click.command()
+@click.argument('model_path', type=click.Path(exists=True), required=True)
+@click.argument('data_path', type=click.Path(exists=True), required=True)
+@click.argument('output_path', type=click.Path(), required=True)
+def main(model_path: str, data_path: str, output_path: str) -> None:
+    """
+    Precomputes SHAP values of the reference dataset for the model, should be run every time the model is saved.
+    The values are used only with the model file they are calculated for, e.g. the exported artifact directory
+    """
+    log('Loading the model and the data')
+    model = load_model(model_path)
+    features = read_dataset(data_path).drop(columns=[TARGET], errors='ignore')
+    log(f'Calculating SHAP values for {len(features)} rows')
+    reference = compute_reference_shap_values(model, features)
+    log('Saving SHAP values')
+    save_reference_shap_values(reference, output_path, get_model_fingerprint(model_path))
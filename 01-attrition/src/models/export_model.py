@@ -0,0 +1,29 @@
+import pickle
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+from src.webapp.dataset_io import read_dataset
+from src.webapp.scoring import TARGET, export_model
+
+
+def log(message: str) -> None:
+    click.echo(f'[{datetime.now():%H:%M:%S}] {message}')
+
+
+@click.command()
+@click.argument('model_path', type=click.Path(exists=True), required=True)
+@click.argument('data_path', type=click.Path(exists=True), required=True)
+@click.argument('output_dir', type=click.Path(), required=True)
+def main(model_path: str, data_path: str, output_dir: str) -> None:
+    """
+    Exports the pickled model pipeline as an artifact directory loaded without unpickling the classifier
+    """
+    log('Loading the model and the data')
+    with open(model_path, 'rb') as file:
+        model = pickle.load(file)
+    features = read_dataset(data_path).drop(columns=[TARGET], errors='ignore')
+    log('Exporting the model')
+    manifest = export_model(model, features, Path(output_dir))
+    log(f'Saved {len(manifest["columns"])} columns schema and {len(manifest["checksums"])} files to {output_dir}')
@@ -0,0 +1,109 @@
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+
+import click
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas import DataFrame, concat
+
+from src.features.build_features import split_into_shards
+from src.webapp.dataset_io import iter_dataset
+from src.webapp.explanations import build_explainer, explain, get_top_contributions, load_reference_shap_values, \
+    select_reference_shap_values
+from src.webapp.scoring import RESULT_COLUMN, get_model_columns, get_model_fingerprint, load_model, predict_attrition, \
+    prepare_features
+
+WORKER_STATE = {}
+
+
+def log(message: str) -> None:
+    click.echo(f'[{datetime.now():%H:%M:%S}] {message}')
+
+
+def init_worker(model_path: str, top_k: int, shap_values_path: str | None) -> None:
+    model = load_model(model_path)
+    WORKER_STATE['model'] = model
+    WORKER_STATE['columns'] = get_model_columns(model_path, model)
+    WORKER_STATE['top_k'] = top_k
+    if top_k > 0:
+        WORKER_STATE['explainer'] = build_explainer(model)
+        reference = load_reference_shap_values(shap_values_path) if shap_values_path else None
+        WORKER_STATE['reference'] = select_reference_shap_values(reference, get_model_fingerprint(model_path))
+
+
+def score_shard(batch: DataFrame) -> DataFrame:
+    """
+    Predicts attrition probability and top-k SHAP contributions with the model loaded by init_worker
+    :param batch: rows of the dataset, columns the model is not trained on are ignored
+    :return: dataframe with probabilities and contributions indexed as the batch
+    """
+    model, top_k = WORKER_STATE['model'], WORKER_STATE['top_k']
+    features = prepare_features(batch, WORKER_STATE['columns'])
+    results = DataFrame({RESULT_COLUMN: predict_attrition(model, features)}, index=features.index)
+    if top_k == 0:
+        return results
+    explanation = explain(model, WORKER_STATE['explainer'], features, WORKER_STATE['reference'])
+    return concat([results, get_top_contributions(explanation, top_k).set_index(features.index)], axis=1)
+
+
+def save_partition(results: DataFrame, output_dir: Path, part: int, partition_by: Iterable[str]) -> None:
+    table = pa.Table.from_pandas(results.reset_index(), preserve_index=False)
+    if partition_by:
+        pq.write_to_dataset(table, output_dir, partition_cols=list(partition_by),
+                            basename_template=f'part-{part:05d}-{{i}}.parquet')
+    else:
+        pq.write_table(table, output_dir / f'part-{part:05d}.parquet')
+
+
+@click.command()
+@click.argument('model_path', type=click.Path(exists=True), required=True)
+@click.argument('data_path', type=click.Path(exists=True), required=True)
+@click.argument('output_dir', type=click.Path(), required=True)
+@click.option('--batch-size', '-bs', type=click.INT, default=50_000)
+@click.option('--workers', '-w', type=click.INT, default=1)
+@click.option('--top-k', '-k', type=click.INT, default=0)
+@click.option('--shap-values-path', '-sv', type=click.Path(), default=None)
+@click.option('--partition-by', '-p', type=click.STRING, multiple=True)
+def main(model_path: str, data_path: str, output_dir: str, batch_size: int, workers: int, top_k: int,
+         shap_values_path: str | None, partition_by: list[str]) -> None:
+    """
+    Scores the dataset batch by batch and writes attrition probabilities, optionally with top-k SHAP contributions,
+    to a directory of Parquet files, one file per batch or hive partitions of the partition-by columns
+    """
+    assert batch_size > 0, 'Batch size should be positive'
+    assert workers > 0, 'Number of workers should be positive'
+    assert top_k >= 0, 'Top-k should be non-negative'
+    output_path = Path(output_dir)
+    assert not output_path.exists() or not any(output_path.iterdir()), 'Output directory should be empty'
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    log('Loading the model')
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                   initargs=(model_path, top_k, shap_values_path)) if workers > 1 else None
+    if executor is None:
+        init_worker(model_path, top_k, shap_values_path)
+
+    total_rows = 0
+    start = perf_counter()
+    try:
+        for part, batch in enumerate(iter_dataset(data_path, batch_size)):
+            batch_start = perf_counter()
+            missing = [col for col in partition_by if col not in batch.columns]
+            assert not missing, f'Partition columns are missing: {", ".join(missing)}'
+            if executor is None:
+                results = score_shard(batch)
+            else:
+                results = concat(executor.map(score_shard, split_into_shards(batch, workers)))
+            results = concat([batch[list(partition_by)], results], axis=1)
+            save_partition(results, output_path, part, partition_by)
+            total_rows += len(batch)
+            log(f'Scored batch {part} of {len(batch)} rows, {len(batch) / (perf_counter() - batch_start):.0f} rows/s')
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = perf_counter() - start
+    log(f'Scored {total_rows} rows in {elapsed:.1f}s, {total_rows / elapsed:.0f} rows/s')
@@ -0,0 +1,122 @@
+import hashlib
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+from pandas import DataFrame, Series, crosstab
+from pandas.api.types import is_numeric_dtype
+from pandas.util import hash_pandas_object
+from plotly.graph_objects import Figure
+
+AGGREGATION_ROWS = int(os.environ.get('CHART_AGGREGATION_ROWS', 5000))
+CHART_BINS = int(os.environ.get('CHART_BINS', 60))
+CHART_CACHE_ENTRIES = int(os.environ.get('CHART_CACHE_ENTRIES', 64))
+
+
+def get_rows_hash(df: DataFrame, columns: list[str]) -> str:
+    """
+    Hashes the index and the charted values of the rows, so filtered views of the same dataset get the same hash
+    regardless of their order, while a reloaded dataset with changed values gets another one
+    :param df: filtered dataset
+    :param columns: charted columns
+    :return: hex digest of the rows
+    """
+    keys = np.sort(hash_pandas_object(df[list(dict.fromkeys(columns))], index=True).to_numpy())
+    return hashlib.sha256(keys.tobytes()).hexdigest()
+
+
+def _box_statistics(values: Series) -> Series:
+    q1, median, q3 = values.quantile([0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[values.between(q1 - 1.5 * iqr, q3 + 1.5 * iqr)]
+    return Series({'q1': q1, 'median': median, 'q3': q3, 'lowerfence': inside.min(),
+                   'upperfence': inside.max(), 'mean': values.mean()})
+
+
+def box_statistics(df: DataFrame, value: str, group: str) -> DataFrame:
+    """
+    Calculates box plot statistics of the value for every group, whiskers end at the furthest values within 1.5 IQR
+    :param df: dataset
+    :param value: numerical column
+    :param group: categorical column
+    :return: dataframe indexed by groups with q1, median, q3, lowerfence, upperfence and mean columns
+    """
+    values = df[[group, value]].dropna()
+    return values.groupby(group, observed=True)[value].apply(_box_statistics).unstack()
+
+
+def category_densities(df: DataFrame, x: str, color: str) -> DataFrame:
+    """
+    Calculates share of every x level within every color level, as px.histogram with probability density does
+    :param df: dataset
+    :param x: categorical column
+    :param color: categorical column
+    :return: dataframe indexed by x levels with a column for every color level
+    """
+    counts = crosstab(df[x].rename('x'), df[color].rename('color'))
+    return counts / counts.sum()
+
+
+def binned_counts(df: DataFrame, x: str, y: str, bins: int = CHART_BINS) -> DataFrame:
+    """
+    Counts points of the scatter plot in a grid of bins x bins rectangular bins
+    :param df: dataset
+    :param x: numerical column
+    :param y: numerical column
+    :param bins: number of bins along every axis
+    :return: dataframe of counts indexed by y bin centers with a column for every x bin center
+    """
+    x_values = df[x].to_numpy(dtype=np.float64, na_value=np.nan)
+    y_values = df[y].to_numpy(dtype=np.float64, na_value=np.nan)
+    present = ~np.isnan(x_values) & ~np.isnan(y_values)
+    counts, x_edges, y_edges = np.histogram2d(x_values[present], y_values[present], bins=bins)
+    return DataFrame(counts.T, index=(y_edges[:-1] + y_edges[1:]) / 2, columns=(x_edges[:-1] + x_edges[1:]) / 2)
+
+
+AGGREGATIONS = {
+    'box': lambda df, x, y: box_statistics(df, y, x),
+    'horizontal-box': lambda df, x, y: box_statistics(df, x, y),
+    'histogram': category_densities,
+    'scatter': binned_counts,
+}
+
+
+@st.cache_data(show_spinner=False, max_entries=CHART_CACHE_ENTRIES)
+def aggregate(kind: str, _df: DataFrame, x: str, y: str, rows_hash: str) -> DataFrame:
+    return AGGREGATIONS[kind](_df, x, y)
+
+
+def _order(index: list, column: str, category_orders: dict[str, list] | None) -> list:
+    if category_orders is None or column not in category_orders:
+        return index
+    return [level for level in category_orders[column] if level in set(index)]
+
+
+def aggregated_box(df: DataFrame, x: str, y: str, category_orders: dict[str, list] | None = None) -> Figure:
+    horizontal = is_numeric_dtype(df[x])
+    group = y if horizontal else x
+    statistics = aggregate('horizontal-box' if horizontal else 'box', df, x, y, get_rows_hash(df, [x, y]))
+    statistics = statistics.loc[_order(list(statistics.index), group, category_orders)]
+    groups = [str(level) for level in statistics.index]
+    box = go.Box(q1=statistics['q1'], median=statistics['median'], q3=statistics['q3'],
+                 lowerfence=statistics['lowerfence'], upperfence=statistics['upperfence'], mean=statistics['mean'],
+                 orientation='h' if horizontal else 'v', **{'y' if horizontal else 'x': groups})
+    return go.Figure(box).update_layout(xaxis_title=x, yaxis_title=y)
+
+
+def aggregated_histogram(df: DataFrame, x: str, y: str, category_orders: dict[str, list] | None = None) -> Figure:
+    densities = aggregate('histogram', df, x, y, get_rows_hash(df, [x, y]))
+    densities = densities.loc[_order(list(densities.index), x, category_orders),
+                              _order(list(densities.columns), y, category_orders)]
+    figure = go.Figure([go.Bar(x=[str(level) for level in densities.index], y=densities[color], name=str(color))
+                        for color in densities.columns])
+    return figure.update_layout(barmode='relative', xaxis_title=x, yaxis_title='probability density',
+                                legend_title_text=y)
+
+
+def aggregated_scatter(df: DataFrame, x: str, y: str, category_orders: dict[str, list] | None = None) -> Figure:
+    counts = aggregate('scatter', df, x, y, get_rows_hash(df, [x, y]))
+    heatmap = go.Heatmap(x=counts.columns, y=counts.index, z=counts.where(counts > 0).to_numpy(),
+                         colorscale='Blues', colorbar_title_text='count')
+    return go.Figure(heatmap).update_layout(xaxis_title=x, yaxis_title=y)
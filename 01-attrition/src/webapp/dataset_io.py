@@ -0,0 +1,110 @@
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from pandas import CategoricalDtype, DataFrame, read_csv, read_parquet
+from pyarrow import feather
+
+ID_COLUMN = 'EmployeeID'
+GZIP_MAGIC = b'\x1f\x8b'
+PARQUET_MAGIC = b'PAR1'
+SATISFACTION_LEVELS = ['Low', 'Medium', 'High', 'Very High']
+ORDINAL_LEVELS = {
+    'Education': ['Below College', 'College', 'Bachelor', 'Master', 'Doctor'],
+    'WorkLifeBalance': ['Bad', 'Good', 'Better', 'Best'],
+    'EnvironmentSatisfaction': SATISFACTION_LEVELS,
+    'JobInvolvement': SATISFACTION_LEVELS,
+    'JobSatisfaction': SATISFACTION_LEVELS,
+    'PerformanceRating': SATISFACTION_LEVELS,
+}
+
+
+def read_dataset(path: str | Path, index_col: str = ID_COLUMN) -> DataFrame:
+    """
+    Reads dataset saved by build-features, format is detected by the file suffix.
+    Arrow IPC (feather) files are memory-mapped and converted column by column without consolidating copies
+    :param path: path to .csv, .parquet, .feather or .arrow file
+    :param index_col: index column of the dataset
+    :return: dataset indexed by index column
+    """
+    suffix = Path(path).suffix
+    if suffix == '.parquet':
+        return read_parquet(path)
+    if suffix in ['.feather', '.arrow']:
+        return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True, self_destruct=True) \
+            .set_index(index_col)
+    return restore_ordinal_columns(read_csv(path, index_col=index_col))
+
+
+def restore_ordinal_columns(df: DataFrame) -> DataFrame:
+    """
+    Converts ordinal columns read from CSV as level labels back to ordered categorical columns
+    :param df: dataframe with ordinal columns, see ORDINAL_LEVELS
+    :return: dataframe with ordered categorical ordinal columns
+    """
+    for column, levels in ORDINAL_LEVELS.items():
+        if column in df.columns:
+            values = df[column]
+            assert values.dropna().isin(levels).all(), f'{column} values should be one of {", ".join(levels)}'
+            df[column] = values.astype(CategoricalDtype(levels, ordered=True))
+    return df
+
+
+def iter_dataset(path: str | Path, batch_size: int, index_col: str = ID_COLUMN) -> Iterator[DataFrame]:
+    """
+    Reads dataset saved by build-features in batches of rows, see read_dataset
+    :param path: path to .csv, .parquet, .feather or .arrow file
+    :param batch_size: maximum number of rows in a batch
+    :param index_col: index column of the dataset
+    :return: iterator over dataset batches indexed by index column
+    """
+    suffix = Path(path).suffix
+    if suffix == '.csv':
+        yield from map(restore_ordinal_columns, read_csv(path, index_col=index_col, chunksize=batch_size))
+        return
+    if suffix == '.parquet':
+        batches = pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+    else:
+        batches = feather.read_table(path, memory_map=True).to_batches(max_chunksize=batch_size)
+    for batch in batches:
+        df = batch.to_pandas()
+        yield df.set_index(index_col) if index_col in df.columns else df
+
+
+def validate_columns(columns: Iterable[str], required_columns: Iterable[str]) -> None:
+    missing = [col for col in required_columns if col not in set(columns)]
+    if missing:
+        raise ValueError(f'File misses required columns: {", ".join(missing)}')
+
+
+def read_upload(buffer: BinaryIO, required_columns: Iterable[str]) -> DataFrame:
+    """
+    Reads uploaded CSV, gzip-compressed CSV or Parquet file directly from the binary buffer with pyarrow.
+    Columns are validated from the CSV header or Parquet metadata before the rows are read
+    :param buffer: binary file-like object, format is detected by its magic bytes
+    :param required_columns: columns the file should have
+    :return: dataframe with the file content, missing values are NaN as with pandas readers
+    """
+    magic = buffer.read(4)
+    buffer.seek(0)
+    if magic == PARQUET_MAGIC:
+        parquet_file = pq.ParquetFile(buffer)
+        validate_columns(parquet_file.schema_arrow.names, required_columns)
+        table = parquet_file.read()
+    else:
+        compression = 'gzip' if magic.startswith(GZIP_MAGIC) else None
+        reader = pa_csv.open_csv(pa.input_stream(buffer, compression=compression),
+                                 convert_options=pa_csv.ConvertOptions(strings_can_be_null=True))
+        validate_columns(reader.schema.names, required_columns)
+        table = reader.read_all()
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    # Arrow converts missing strings to None, which the model rejects, replace them in place without copying
+    for column in df.columns[df.dtypes == object]:
+        missing = df[column].isna()
+        if missing.any():
+            df.loc[missing, column] = np.nan
+    return df
@@ -0,0 +1,178 @@
+import hashlib
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas import DataFrame, Series
+from pandas.api.types import is_numeric_dtype
+from pandas.util import hash_pandas_object
+
+if TYPE_CHECKING:
+    import shap
+    from sklearn.pipeline import Pipeline
+
+BASE_VALUE_COLUMN = 'BaseValue'
+MODEL_FINGERPRINT_KEY = 'model_fingerprint'
+
+
+def build_explainer(model: 'Pipeline') -> 'shap.TreeExplainer':
+    import shap
+
+    return shap.TreeExplainer(model[-1])
+
+
+def get_row_keys(features: DataFrame) -> Series:
+    """
+    Hashes feature rows, so the same employee gets the same key regardless of the format the data is read from.
+    Numeric values are rounded to float32 as Parquet and Arrow IPC datasets of build-features store them
+    :param features: model features
+    :return: series with uint64 key of every row
+    """
+    canonical = DataFrame({
+        col: features[col].astype('float32') if is_numeric_dtype(features[col]) else features[col].astype(str)
+        for col in features.columns
+    })
+    return hash_pandas_object(canonical, index=False)
+
+
+def get_data_hash(features: DataFrame) -> str:
+    digest = hashlib.sha256('|'.join(map(str, features.columns)).encode())
+    digest.update(get_row_keys(features).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def compute_reference_shap_values(model: 'Pipeline', features: DataFrame) -> DataFrame:
+    """
+    Calculates SHAP values for the reference dataset
+    :param model: model pipeline, the last step should be tree model
+    :param features: model features of the dataset
+    :return: dataframe with SHAP values of every feature and base value indexed by row key, see get_row_keys
+    """
+    explanation = build_explainer(model)(model[:-1].transform(features))
+    reference = DataFrame(explanation.values, columns=features.columns, index=get_row_keys(features))
+    reference[BASE_VALUE_COLUMN] = explanation.base_values
+    return reference[~reference.index.duplicated()]
+
+
+def save_reference_shap_values(reference: DataFrame, path: str, model_fingerprint: str) -> None:
+    """
+    Saves SHAP values to parquet with the fingerprint of the model they are calculated with in the file metadata
+    :param reference: SHAP values, see compute_reference_shap_values
+    :param path: path to parquet file
+    :param model_fingerprint: fingerprint of the model file, see scoring.get_model_fingerprint
+    """
+    table = pa.Table.from_pandas(reference)
+    metadata = {**table.schema.metadata, MODEL_FINGERPRINT_KEY.encode(): model_fingerprint.encode()}
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+def load_reference_shap_values(path: str) -> DataFrame | None:
+    """
+    Loads SHAP values saved by save_reference_shap_values, the model fingerprint is kept in attrs
+    :param path: path to parquet file
+    :return: SHAP values or None if the file does not exist
+    """
+    try:
+        table = pq.read_table(path)
+    except FileNotFoundError:
+        return None
+    reference = table.to_pandas()
+    metadata = table.schema.metadata or {}
+    reference.attrs[MODEL_FINGERPRINT_KEY] = metadata.get(MODEL_FINGERPRINT_KEY.encode(), b'').decode()
+    return reference
+
+
+def select_reference_shap_values(reference: DataFrame | None, model_fingerprint: str) -> DataFrame | None:
+    """
+    Drops SHAP values calculated with another model, e.g. the one replaced by retraining
+    :param reference: SHAP values, see load_reference_shap_values
+    :param model_fingerprint: fingerprint of the model file, see scoring.get_model_fingerprint
+    :return: SHAP values if they are calculated with the model, None otherwise
+    """
+    if reference is None or reference.attrs.get(MODEL_FINGERPRINT_KEY) != model_fingerprint:
+        return None
+    return reference
+
+
+def explain(model: 'Pipeline', explainer: 'shap.TreeExplainer', features: DataFrame,
+            reference: DataFrame | None = None) -> 'shap.Explanation':
+    """
+    Explains predictions with SHAP values, values of rows present in the reference dataset are looked up
+    :param model: model pipeline, the last step should be tree model
+    :param explainer: explainer of the model, see build_explainer
+    :param features: model features of the rows to explain
+    :param reference: precomputed SHAP values, see compute_reference_shap_values
+    :return: explanation of the rows
+    """
+    import shap
+
+    transformed = model[:-1].transform(features)
+    values = np.empty(features.shape)
+    base_values = np.empty(len(features))
+    keys = get_row_keys(features)
+    known = np.zeros(len(features), dtype=bool)
+    if reference is not None and set(features.columns) <= set(reference.columns):
+        known = keys.isin(reference.index).to_numpy()
+    if known.any():
+        values[known] = reference.loc[keys[known], features.columns].to_numpy()
+        base_values[known] = reference.loc[keys[known], BASE_VALUE_COLUMN].to_numpy()
+    if not known.all():
+        computed = explainer(transformed[~known])
+        values[~known] = computed.values
+        base_values[~known] = computed.base_values
+    return shap.Explanation(values, base_values=base_values, data=transformed, feature_names=list(features.columns))
+
+
+def explain_in_chunks(model: 'Pipeline', explainer: 'shap.TreeExplainer', features: DataFrame,
+                      reference: DataFrame | None = None, chunk_size: int = 256, workers: int | None = None,
+                      on_progress: Callable[[float], None] | None = None) -> 'shap.Explanation':
+    """
+    Explains predictions splitting the rows into fixed-size chunks explained by a pool of threads,
+    so memory used by a single explainer call is bounded
+    :param model: model pipeline, the last step should be tree model
+    :param explainer: explainer of the model, see build_explainer
+    :param features: model features of the rows to explain
+    :param reference: precomputed SHAP values, see compute_reference_shap_values
+    :param chunk_size: number of rows in a chunk
+    :param workers: number of threads, see concurrent.futures.ThreadPoolExecutor
+    :param on_progress: callback receiving the share of explained chunks, called from the calling thread
+    :return: explanation of the rows in the input order
+    """
+    import shap
+
+    chunks = [features.iloc[start:start + chunk_size] for start in range(0, len(features), chunk_size)]
+    if len(chunks) <= 1:
+        return explain(model, explainer, features, reference)
+
+    results = [None] * len(chunks)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(explain, model, explainer, chunk, reference): i for i, chunk in enumerate(chunks)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_progress is not None:
+                on_progress(done / len(chunks))
+    return shap.Explanation(np.concatenate([result.values for result in results]),
+                            base_values=np.concatenate([result.base_values for result in results]),
+                            data=np.concatenate([result.data for result in results]),
+                            feature_names=list(features.columns))
+
+
+def get_top_contributions(explanation: 'shap.Explanation', top_k: int) -> DataFrame:
+    """
+    Selects features with the largest absolute SHAP values of every row
+    :param explanation: explanation of the rows, see explain
+    :param top_k: number of features per row
+    :return: dataframe with TopFeature{i} and TopContribution{i} columns for i from 1 to top_k
+    """
+    values = np.asarray(explanation.values)
+    order = np.argsort(-np.abs(values), axis=1, kind='stable')[:, :top_k]
+    names = np.asarray(explanation.feature_names)
+    contributions = np.take_along_axis(values, order, axis=1)
+    top = {}
+    for i in range(order.shape[1]):
+        top[f'TopFeature{i + 1}'] = names[order[:, i]]
+        top[f'TopContribution{i + 1}'] = contributions[:, i]
+    return DataFrame(top)
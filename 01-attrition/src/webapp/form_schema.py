@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+from enum import Enum
+
+from pandas import CategoricalDtype, DataFrame
+from pandas.api.types import is_float_dtype, is_numeric_dtype
+
+
+class FieldKind(Enum):
+    NUMERICAL = 'numerical'
+    CATEGORICAL = 'categorical'
+
+
+@dataclass(frozen=True)
+class FieldSchema:
+    name: str
+    kind: FieldKind
+    levels: tuple[str, ...] = ()
+    min_value: int | float | None = None
+    max_value: int | float | None = None
+    step: int | float = 1
+    default: int | float | None = None
+
+
+def build_field_schema(df: DataFrame, column: str) -> FieldSchema:
+    values = df[column]
+    if not is_numeric_dtype(values):
+        levels = values.cat.categories if isinstance(values.dtype, CategoricalDtype) else values.dropna().unique()
+        return FieldSchema(column, FieldKind.CATEGORICAL, levels=tuple(levels))
+    cast = float if is_float_dtype(values) else int
+    return FieldSchema(column, FieldKind.NUMERICAL, min_value=cast(values.min()), max_value=cast(values.max()),
+                       step=0.01 if cast is float else 1, default=cast(values.median()))
+
+
+def build_form_schema(df: DataFrame, exclude: tuple[str, ...] = ()) -> tuple[FieldSchema, ...]:
+    """
+    Describes the input widget of every column, so the form is rendered without touching the dataset
+    :param df: dataset
+    :param exclude: columns without widgets
+    :return: schema of every column in the dataset order
+    """
+    return tuple(build_field_schema(df, col) for col in df.columns if col not in exclude)
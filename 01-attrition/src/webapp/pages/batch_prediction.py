@@ -1,27 +1,29 @@
+import hashlib
 import os
-import pickle
-from io import StringIO
+from typing import TYPE_CHECKING, BinaryIO
 
 import numpy as np
-import shap
 import streamlit as st
-from pandas import DataFrame, read_csv, Series
-from sklearn.pipeline import Pipeline
-from st_aggrid import AgGrid, AgGridReturn, GridOptionsBuilder, DataReturnMode
-from streamlit_shap import st_shap
+from pandas import DataFrame, Series
 
-MODEL_PATH = os.environ.get('MODEL_PATH', 'models/CatBoostClassifier.pkl')
-DATA_PATH = os.environ.get('DATA_PATH', 'data/interim/data.csv')
+import explanations
+import scoring
+from dataset_io import read_upload
+from paging import GridPage, paginated_grid
+from registry import get_registry
+
+if TYPE_CHECKING:
+    import shap
+    from sklearn.pipeline import Pipeline
+
+EXPLANATION_CHUNK_SIZE = int(os.environ.get('EXPLANATION_CHUNK_SIZE', 256))
+EXPLANATION_WORKERS = int(os.environ.get('EXPLANATION_WORKERS', os.cpu_count() or 1))
 
 st.set_page_config(layout='wide')
 
 
-def show_dataframe(df: DataFrame, selection_mode: str | None = 'single', page_size: int = 20) -> AgGridReturn:
-    options_builder = GridOptionsBuilder.from_dataframe(df)
-    options_builder.from_dataframe(df)
-    options_builder.configure_pagination(True, paginationPageSize=page_size, paginationAutoPageSize=False)
-    options_builder.configure_selection(selection_mode=selection_mode, use_checkbox=True)
-    return AgGrid(df, gridOptions=options_builder.build(), data_return_mode=DataReturnMode.FILTERED)
+def show_dataframe(df: DataFrame, key: str, selection_mode: str | None = 'single', page_size: int = 20) -> GridPage:
+    return paginated_grid(df, key, page_size=page_size, selection_mode=selection_mode)
 
 
 def set_button_pressed_value(value: bool) -> None:
@@ -34,32 +36,48 @@ def is_button_pressed() -> bool:
     return st.session_state['predicted']
 
 
-@st.cache_resource
-def load_model() -> Pipeline:
-    with open(MODEL_PATH, 'rb') as file:
-        return pickle.load(file)
-
-
-@st.cache_data
-def load_data() -> DataFrame:
-    return read_csv(DATA_PATH, index_col='EmployeeID')
-
+@st.cache_data(show_spinner='Scoring the upload', max_entries=16)
+def score_upload(_df: DataFrame, upload_hash: str, model_fingerprint: str) -> Series:
+    """
+    Scores the whole upload once per upload content and model
+    :param _df: uploaded dataframe
+    :param upload_hash: hash of the uploaded file content
+    :param model_fingerprint: hash of the model file
+    :return: attrition probabilities indexed by feature row keys, see explanations.get_row_keys
+    """
+    registry = get_registry()
+    features = scoring.prepare_features(_df, registry.get_data().columns)
+    scores = Series(scoring.predict_attrition(registry.get_model(), features),
+                    index=explanations.get_row_keys(features))
+    return scores[~scores.index.duplicated()]
+
+
+def get_predictions(features: DataFrame, scores: Series, model: 'Pipeline') -> np.ndarray:
+    results = scores.reindex(explanations.get_row_keys(features)).to_numpy()
+    missing = np.isnan(results)
+    if missing.any():
+        results[missing] = scoring.predict_attrition(model, features[missing])
+    return results
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def get_shap_values(_prepared_data: DataFrame, _model: 'Pipeline', data_hash: str,
+                    model_fingerprint: str) -> 'shap.Explanation':
+    registry = get_registry()
+    progress_bar = st.progress(0.0, text='Explaining predictions')
+    explanation = explanations.explain_in_chunks(
+        _model, registry.get_explainer(), _prepared_data, registry.get_reference_shap_values(),
+        EXPLANATION_CHUNK_SIZE, EXPLANATION_WORKERS,
+        lambda done: progress_bar.progress(done, text=f'Explaining predictions ({100 * done:.0f}%)')
+    )
+    progress_bar.empty()
+    return explanation
+
+
+def explain_predictions(explanation: 'shap.Explanation', number_of_columns: int) -> None:
+    import shap
+    from streamlit_shap import st_shap
 
-def drop_if_exist(df: DataFrame, *columns: str) -> DataFrame:
-    for col in columns:
-        if col in df.columns:
-            df = df.drop(columns=[col])
-    return df
-
-
-def get_shap_values(prepared_data_copy: DataFrame, _model: Pipeline) -> shap.Explanation:
-    explainer = shap.TreeExplainer(_model[-1])
-    shap_values = explainer(_model[:-1].transform(prepared_data_copy))
-    shap_values.feature_names = prepared_data_copy.columns
-    return shap_values
-
-
-def explain_predictions(explanation: shap.Explanation, number_of_columns: int) -> None:
     st.subheader('Explanation with SHAP')
     if len(explanation) == 1:
         plot_type = st.radio('Explanation format', options=['Beeswarm', 'Waterfall'], index=len(explanation) > 0)
@@ -71,40 +89,68 @@ def explain_predictions(explanation: shap.Explanation, number_of_columns: int) -
         st_shap(shap.plots.waterfall(explanation[0], max_display=number_of_columns))
 
 
-def make_prediction(df: DataFrame, explain: bool) -> None:
-    real_data = load_data()
-    model = load_model()
-    prepared_data = drop_if_exist(df.copy()[real_data.columns], 'Attrition')
-    results = model.predict_proba(prepared_data)
+def make_prediction(df: DataFrame, explain: bool, scores: Series) -> None:
+    real_data = get_registry().get_data()
+    model = get_registry().get_model()
+    prepared_data = scoring.prepare_features(df, real_data.columns)
+    results = get_predictions(prepared_data, scores, model)
     result_column = 'Attrition probability (%)'
-    prepared_data.insert(1, result_column, Series(data=np.round(100 * results[:, 1], 1)))
+    prepared_data.insert(1, result_column, np.round(100 * results, 1))
     st.subheader('Results')
-    grid_data = show_dataframe(prepared_data, selection_mode='multiple')
+    grid_data = show_dataframe(prepared_data, 'results', selection_mode='multiple')
     if not explain:
         return
-    selected_data = grid_data.data \
-        if len(grid_data.selected_rows) == 0 \
-        else DataFrame(grid_data.selected_rows).drop(columns=['_selectedRowNodeInfo'])
+    if len(grid_data.selected_rows) == 0:
+        top_k = st.number_input('Explain only top-k highest-risk rows (0 to explain all of them)',
+                                min_value=0, max_value=len(grid_data.data), value=0, step=1)
+        selected_data = grid_data.data if top_k == 0 else grid_data.data.nlargest(top_k, result_column)
+    else:
+        selected_data = DataFrame(grid_data.selected_rows).drop(columns=['_selectedRowNodeInfo'])
     selected_data.fillna(value=np.nan, inplace=True)
-    explain_predictions(get_shap_values(selected_data.drop(columns=[result_column]), model),
+    features = selected_data.drop(columns=[result_column])
+    explain_predictions(get_shap_values(features, model, explanations.get_data_hash(features),
+                                        get_registry().get_model_fingerprint()),
                         len(real_data.columns) - 1)
 
 
-def show_data(file: DataFrame) -> None:
-    selection_data = show_dataframe(file, selection_mode='multiple')
+def show_data(file: DataFrame, upload_hash: str) -> None:
+    selection_data = show_dataframe(file, 'upload', selection_mode='multiple')
     prediction_data = selection_data.data \
         if len(selection_data.selected_rows) == 0 \
         else DataFrame(selection_data.selected_rows).drop(columns=['_selectedRowNodeInfo'])
     explain = st.checkbox('Explain predictions')
     if st.button('Make prediction') or is_button_pressed():
         set_button_pressed_value(True)
-        make_prediction(prediction_data, explain)
+        scores = score_upload(file, upload_hash, get_registry().get_model_fingerprint())
+        make_prediction(prediction_data, explain, scores)
     else:
         set_button_pressed_value(False)
 
 
-file = st.file_uploader('Upload your dataframe')
+def parse_upload(file: BinaryIO, upload_hash: str) -> DataFrame:
+    """
+    Reads the upload once per upload content. The dataframe is kept in the session state, unlike st.cache_data
+    it is neither copied nor pickled
+    :param file: uploaded file
+    :param upload_hash: hash of the uploaded file content
+    :return: uploaded dataframe
+    """
+    if st.session_state.get('upload_hash') != upload_hash:
+        st.session_state.pop('upload', None)
+        with st.spinner('Reading the upload'):
+            st.session_state['upload'] = read_upload(
+                file, get_registry().get_data().columns.drop(scoring.TARGET, errors='ignore'))
+        st.session_state['upload_hash'] = upload_hash
+    return st.session_state['upload']
+
+
+file = st.file_uploader('Upload your dataframe', type=['csv', 'gz', 'parquet'])
 if file is not None:
-    content = file.read().decode()
-    df = read_csv(StringIO(content))
-    show_data(df)
+    upload_hash = hashlib.file_digest(file, 'sha256').hexdigest()
+    file.seek(0)
+    try:
+        df = parse_upload(file, upload_hash)
+    except ValueError as error:
+        st.error(f'Can not read the file: {error}')
+        st.stop()
+    show_data(df, upload_hash)
@@ -1,13 +1,17 @@
-import os
-
+from collections.abc import Callable
 from enum import Enum
+from typing import TYPE_CHECKING
 
 import streamlit as st
-import plotly.express as px
 
-from pandas import read_csv, DataFrame
-from plotly.graph_objects import Figure
-from st_aggrid import AgGrid, GridOptionsBuilder, DataReturnMode
+from pandas import CategoricalDtype, DataFrame
+from pandas.api.types import is_numeric_dtype
+
+from paging import paginated_grid
+from registry import get_registry
+
+if TYPE_CHECKING:
+    from plotly.graph_objects import Figure
 
 
 class FeatureType(Enum):
@@ -15,45 +19,56 @@ class FeatureType(Enum):
     CATEGORICAL = 'categorical'
 
 
-def histogram_wrapper(df: DataFrame, x: str, y: str) -> Figure:
-    return px.histogram(df, x=x, color=y, histnorm='probability density')
+def histogram_wrapper(df: DataFrame, x: str, y: str, **kwargs) -> 'Figure':
+    import plotly.express as px
 
+    return px.histogram(df, x=x, color=y, histnorm='probability density', **kwargs)
 
-DATA_PATH = os.environ.get('DATA_PATH', 'data/interim/data.csv')
 
-st.set_page_config(layout='wide')
+def get_display_types(rows: int) -> dict[tuple[FeatureType, FeatureType], Callable[..., 'Figure']]:
+    import plotly.express as px
 
+    import charts
 
-@st.cache_data
-def load_data() -> DataFrame:
-    return read_csv(DATA_PATH, index_col='EmployeeID')
+    if rows > charts.AGGREGATION_ROWS:
+        return {
+            (FeatureType.NUMERICAL, FeatureType.NUMERICAL): charts.aggregated_scatter,
+            (FeatureType.NUMERICAL, FeatureType.CATEGORICAL): charts.aggregated_box,
+            (FeatureType.CATEGORICAL, FeatureType.NUMERICAL): charts.aggregated_box,
+            (FeatureType.CATEGORICAL, FeatureType.CATEGORICAL): charts.aggregated_histogram
+        }
+    return {
+        (FeatureType.NUMERICAL, FeatureType.NUMERICAL): px.scatter,
+        (FeatureType.NUMERICAL, FeatureType.CATEGORICAL): px.box,
+        (FeatureType.CATEGORICAL, FeatureType.NUMERICAL): px.box,
+        (FeatureType.CATEGORICAL, FeatureType.CATEGORICAL): histogram_wrapper
+    }
+
+
+st.set_page_config(layout='wide')
 
 
 st.header('Data page')
 
 page_size = st.slider('Number of rows in a page', min_value=0, max_value=100, value=20)
-data = load_data()
-options_builder = GridOptionsBuilder.from_dataframe(data)
-options_builder.from_dataframe(data)
-options_builder.configure_pagination(True, paginationPageSize=page_size, paginationAutoPageSize=False)
-returned = AgGrid(data, gridOptions=options_builder.build(), data_return_mode=DataReturnMode.FILTERED)
+data = get_registry().get_data()
+category_orders = {col: list(data[col].cat.categories) for col in data.columns
+                   if isinstance(data[col].dtype, CategoricalDtype) and data[col].cat.ordered}
+returned = paginated_grid(data, 'data', page_size=page_size, selection_mode=None)
 
 data = returned.data
 columns = list(data.columns)
-numerical_features = {col for col in data.columns if data[col].dtype != object}
+numerical_features = {col for col in data.columns if is_numeric_dtype(data[col])}
 categorical_features = set(data.columns) - numerical_features
 
 x_axis = st.selectbox('X axis', columns)
 y_axis = st.selectbox('Y axis', columns)
 
-display_types = {
-    (FeatureType.NUMERICAL, FeatureType.NUMERICAL): px.scatter,
-    (FeatureType.NUMERICAL, FeatureType.CATEGORICAL): px.box,
-    (FeatureType.CATEGORICAL, FeatureType.NUMERICAL): px.box,
-    (FeatureType.CATEGORICAL, FeatureType.CATEGORICAL): histogram_wrapper
-}
+display_types = get_display_types(len(data))
 
 x_feature_type = FeatureType.NUMERICAL if x_axis in numerical_features else FeatureType.CATEGORICAL
 y_feature_type = FeatureType.NUMERICAL if y_axis in numerical_features else FeatureType.CATEGORICAL
 
-st.plotly_chart(display_types[x_feature_type, y_feature_type](data, x=x_axis, y=y_axis), use_container_width=True)
+st.plotly_chart(display_types[x_feature_type, y_feature_type](data, x=x_axis, y=y_axis,
+                                                              category_orders=category_orders),
+                use_container_width=True)
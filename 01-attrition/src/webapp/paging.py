@@ -0,0 +1,76 @@
+import os
+from dataclasses import dataclass, field
+from math import ceil
+
+import numpy as np
+import streamlit as st
+from pandas import DataFrame
+from pandas.api.types import is_integer_dtype, is_numeric_dtype
+
+GRID_MAX_ROWS = int(os.environ.get('GRID_MAX_ROWS', 1000))
+
+
+@dataclass
+class GridPage:
+    data: DataFrame
+    selected_rows: list[dict] = field(default_factory=list)
+
+
+def filter_dataframe(df: DataFrame, key: str) -> DataFrame:
+    columns = st.multiselect('Filter by', df.columns, key=f'{key}-filter-columns')
+    mask = np.ones(len(df), dtype=bool)
+    for col in columns:
+        if is_numeric_dtype(df[col]):
+            cast = int if is_integer_dtype(df[col]) else float
+            low, high = cast(df[col].min()), cast(df[col].max())
+            if low == high:
+                continue
+            selected = st.slider(col, low, high, (low, high), key=f'{key}-filter-{col}')
+            matches = df[col].between(*selected)
+            keep_missing = selected == (low, high)
+        else:
+            levels = list(df[col].dropna().unique())
+            selected = st.multiselect(col, levels, default=levels, key=f'{key}-filter-{col}')
+            matches = df[col].isin(selected)
+            keep_missing = len(selected) == len(levels)
+        # missing values are in no range or level, they are filtered out only when the filter is narrowed
+        if keep_missing:
+            matches |= df[col].isna()
+        mask &= matches.to_numpy()
+    return df[mask]
+
+
+def sort_dataframe(df: DataFrame, key: str) -> DataFrame:
+    column = st.selectbox('Sort by', [None, *df.columns], key=f'{key}-sort-column')
+    descending = st.checkbox('Descending', key=f'{key}-sort-descending')
+    if column is None:
+        return df
+    return df.sort_values(column, ascending=not descending, kind='stable')
+
+
+def paginated_grid(df: DataFrame, key: str, page_size: int = 20,
+                   selection_mode: str | None = 'single') -> GridPage:
+    """
+    Shows the dataframe in a grid paginated on the server: filtering and sorting run in pandas
+    and only the rows of the current page are sent to the browser
+    :param df: dataframe to show
+    :param key: unique key of the grid widgets on the page
+    :param page_size: number of rows in a page, capped by GRID_MAX_ROWS
+    :param selection_mode: grid selection mode, selection is disabled if None
+    :return: filtered and sorted rows of all the pages and rows selected on the current page
+    """
+    from st_aggrid import AgGrid, GridOptionsBuilder
+
+    with st.expander('Filter and sort'):
+        df = sort_dataframe(filter_dataframe(df, key), key)
+    page_size = max(1, min(page_size, GRID_MAX_ROWS))
+    pages = max(1, ceil(len(df) / page_size))
+    page = min(st.number_input(f'Page (of {pages}, {len(df)} rows)', min_value=1, value=1, step=1,
+                               key=f'{key}-page'), pages)
+    page_data = df.iloc[(page - 1) * page_size:page * page_size]
+
+    options_builder = GridOptionsBuilder.from_dataframe(page_data)
+    if selection_mode is not None:
+        options_builder.configure_selection(selection_mode=selection_mode, use_checkbox=True)
+    returned = AgGrid(page_data, gridOptions=options_builder.build(), key=f'{key}-grid-{page}')
+    return GridPage(df, returned.selected_rows)
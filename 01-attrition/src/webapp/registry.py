@@ -0,0 +1,138 @@
+import os
+from collections.abc import Callable
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+import streamlit as st
+from pandas import DataFrame
+
+import explanations
+import scoring
+from dataset_io import read_dataset
+from form_schema import FieldSchema, build_form_schema
+
+if TYPE_CHECKING:
+    import shap
+    from sklearn.pipeline import Pipeline
+
+DATA_PATH = os.environ.get('DATA_PATH', 'data/interim/data.csv')
+MODEL_PATH = os.environ.get('MODEL_PATH', 'models/CatBoostClassifier.pkl')
+SHAP_VALUES_PATH = os.environ.get('SHAP_VALUES_PATH', 'models/CatBoostClassifier.shap.parquet')
+
+T = TypeVar('T')
+
+
+def get_file_state(path: str) -> tuple[int, int] | None:
+    if Path(path).is_dir():
+        path = str(Path(path) / scoring.MANIFEST_NAME)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_fingerprint(path: str) -> str:
+    return scoring.get_model_fingerprint(path) if get_file_state(path) is not None else ''
+
+
+class Resource(Generic[T]):
+    """
+    Object loaded from a file and reloaded when the file changes. The file is hashed only when its mtime or size
+    changes, and the object is reloaded only when the hash changes
+    """
+
+    def __init__(self, path: str, load: Callable[[str], T]) -> None:
+        self.path = path
+        self.load = load
+        self.fingerprint = ''
+        self._state: tuple[int, int] | None = None
+        self._value: T | None = None
+        self._loaded = False
+        self._lock = Lock()
+
+    def get(self) -> T:
+        with self._lock:
+            state = get_file_state(self.path)
+            if not self._loaded or state != self._state:
+                fingerprint = get_fingerprint(self.path)
+                if not self._loaded or fingerprint != self.fingerprint:
+                    self._value = self.load(self.path)
+                    self.fingerprint = fingerprint
+                    self._loaded = True
+                self._state = state
+            return self._value
+
+
+class Registry:
+    """
+    Dataset, model and explanation resources shared by all the pages and sessions of the server
+    """
+
+    def __init__(self, data_path: str = DATA_PATH, model_path: str = MODEL_PATH,
+                 shap_values_path: str = SHAP_VALUES_PATH) -> None:
+        self.data = Resource(data_path, read_dataset)
+        self.model = Resource(model_path, scoring.load_model)
+        self.reference_shap_values = Resource(shap_values_path, explanations.load_reference_shap_values)
+        self._derived_objects: dict[tuple[str, str], object] = {}
+        self._lock = Lock()
+
+    def get_data(self) -> DataFrame:
+        """
+        Returns a shallow copy of the dataset: it shares the column data with other pages without copying it,
+        while adding or dropping columns does not affect them. Values should not be modified in place
+        """
+        return self.data.get().copy(deep=False)
+
+    def get_model(self) -> 'Pipeline':
+        return self.model.get()
+
+    def get_model_fingerprint(self) -> str:
+        self.model.get()
+        return self.model.fingerprint
+
+    def _get_derived_object(self, name: str, resource: Resource, build: Callable[[object], T]) -> T:
+        """
+        Returns the object built from the resource, it is rebuilt only when the resource file fingerprint changes
+        """
+        value = resource.get()
+        key = name, resource.fingerprint
+        with self._lock:
+            if key not in self._derived_objects:
+                self._derived_objects = {old_key: old_value for old_key, old_value in self._derived_objects.items()
+                                         if old_key[0] != name}
+                self._derived_objects[key] = build(value)
+            return self._derived_objects[key]
+
+    def get_explainer(self) -> 'shap.TreeExplainer':
+        return self._get_derived_object('explainer', self.model, explanations.build_explainer)
+
+    def get_row_predictor(self) -> scoring.RowPredictor:
+        columns = self.data.get().columns
+        return self._get_derived_object('row-predictor', self.model, lambda model: scoring.RowPredictor(model, columns))
+
+    def get_form_schema(self) -> tuple[FieldSchema, ...]:
+        return self._get_derived_object('form-schema', self.data,
+                                        lambda data: build_form_schema(data, exclude=(scoring.TARGET,)))
+
+    def warm_up(self) -> None:
+        """
+        Loads the dataset, the model and the objects built from them, so the first page does not wait for them
+        """
+        self.get_form_schema()
+        self.get_row_predictor()
+        self.get_explainer()
+        self.get_reference_shap_values()
+
+    def get_reference_shap_values(self) -> DataFrame | None:
+        """
+        Returns precomputed SHAP values if they are calculated with the current model
+        """
+        return explanations.select_reference_shap_values(self.reference_shap_values.get(),
+                                                         self.get_model_fingerprint())
+
+
+@st.cache_resource
+def get_registry() -> Registry:
+    return Registry()
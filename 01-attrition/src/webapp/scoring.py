@@ -0,0 +1,175 @@
+import hashlib
+import json
+import pickle
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pandas import DataFrame, Index, isna
+
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+
+TARGET = 'Attrition'
+RESULT_COLUMN = 'AttritionProbability'
+ARTIFACT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+PREPROCESSING_NAME = 'preprocessing.pkl'
+CLASSIFIER_NAME = 'classifier.cbm'
+
+
+def load_model(path: str) -> 'Pipeline':
+    """
+    Loads the model pipeline from a pickle file or from an artifact directory, see export_model
+    :param path: path to the pickle file or the artifact directory
+    :return: model pipeline
+    """
+    if Path(path).is_dir():
+        return load_model_artifact(Path(path))
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def get_file_fingerprint(path: str) -> str:
+    with open(path, 'rb') as file:
+        return hashlib.file_digest(file, 'sha256').hexdigest()
+
+
+def get_model_fingerprint(path: str) -> str:
+    return get_file_fingerprint(str(Path(path) / MANIFEST_NAME) if Path(path).is_dir() else path)
+
+
+def export_model(model: 'Pipeline', features: DataFrame, directory: Path) -> dict:
+    """
+    Saves the model as an artifact directory: preprocessing steps pickled without the classifier,
+    the classifier in the CatBoost native format and a manifest with the column schema and checksums
+    :param model: model pipeline, the last step should be CatBoostClassifier
+    :param features: model features of the dataset the model is trained on
+    :param directory: artifact directory
+    :return: manifest
+    """
+    from catboost import CatBoostClassifier
+
+    assert isinstance(model[-1], CatBoostClassifier), 'The last step of the model should be CatBoostClassifier'
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / PREPROCESSING_NAME, 'wb') as file:
+        pickle.dump(model[:-1], file, protocol=pickle.HIGHEST_PROTOCOL)
+    model[-1].save_model(str(directory / CLASSIFIER_NAME))
+    manifest = {
+        'version': ARTIFACT_VERSION,
+        'classifier_step': model.steps[-1][0],
+        'columns': [{'name': col, 'dtype': str(features[col].dtype)} for col in features.columns],
+        'cat_features': [int(i) for i in model[-1].get_cat_feature_indices()],
+        'checksums': {name: get_file_fingerprint(str(directory / name))
+                      for name in [PREPROCESSING_NAME, CLASSIFIER_NAME]},
+    }
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest, indent=4))
+    return manifest
+
+
+def read_manifest(directory: Path) -> dict:
+    manifest = json.loads((directory / MANIFEST_NAME).read_text())
+    assert manifest['version'] == ARTIFACT_VERSION, f'Unsupported artifact version: {manifest["version"]}'
+    return manifest
+
+
+def load_model_artifact(directory: Path) -> 'Pipeline':
+    from catboost import CatBoostClassifier
+    from sklearn.pipeline import Pipeline
+
+    manifest = read_manifest(directory)
+    for name, checksum in manifest['checksums'].items():
+        assert get_file_fingerprint(str(directory / name)) == checksum, f'Checksum mismatch: {directory / name}'
+    with open(directory / PREPROCESSING_NAME, 'rb') as file:
+        preprocessing = pickle.load(file)
+    classifier = CatBoostClassifier().load_model(str(directory / CLASSIFIER_NAME))
+    model = Pipeline([*preprocessing.steps, (manifest['classifier_step'], classifier)])
+    columns = [col['name'] for col in manifest['columns']]
+    assert list(getattr(model, 'feature_names_in_', columns)) == columns, 'Model columns do not match the manifest'
+    assert [int(i) for i in classifier.get_cat_feature_indices()] == manifest['cat_features'], \
+        'Categorical features of the classifier do not match the manifest'
+    return model
+
+
+def get_model_columns(path: str, model: 'Pipeline') -> Index:
+    """
+    Returns columns the model is trained on without reading the dataset
+    :param path: path to the pickle file or the artifact directory the model is loaded from
+    :param model: model pipeline
+    :return: columns from the artifact manifest or feature names of the pickled pipeline
+    """
+    if Path(path).is_dir():
+        return Index([col['name'] for col in read_manifest(Path(path))['columns']])
+    return Index(model.feature_names_in_)
+
+
+def prepare_features(df: DataFrame, columns: Index) -> DataFrame:
+    """
+    Aligns columns of the data to the ones of the dataset the model is trained on
+    :param df: data to score, may contain extra columns and may miss the target one
+    :param columns: columns of the dataset
+    :return: copy of the data with dataset columns except the target one, missing values are NaN
+    regardless of the reader, e.g. None of Arrow string columns
+    """
+    return df[columns.drop(TARGET, errors='ignore')].fillna(value=np.nan)
+
+
+def predict_attrition(model: 'Pipeline', features: DataFrame) -> np.ndarray:
+    return model.predict_proba(features)[:, 1]
+
+
+class RowPredictor:
+    """
+    Scores single rows without pandas: imputers of the preprocessing are compiled into fill values
+    in the training column order and the row is passed to the CatBoost classifier as a plain list.
+    Other pipelines are scored through predict_attrition
+    """
+
+    def __init__(self, model: 'Pipeline', columns: Index) -> None:
+        self.model = model
+        self.columns = list(getattr(model, 'feature_names_in_', columns.drop(TARGET, errors='ignore')))
+        self.fill_values: list | None = None
+        self.is_categorical: list[bool] = []
+        if not hasattr(model[-1], 'get_cat_feature_indices'):
+            return
+        try:
+            self.fill_values = self.compile_preprocessing(model[:-1])
+        except ValueError:
+            return
+        categorical = set(model[-1].get_cat_feature_indices())
+        self.is_categorical = [i in categorical for i in range(len(self.columns))]
+
+    def compile_preprocessing(self, preprocessing: 'Pipeline') -> list:
+        from sklearn.impute import SimpleImputer
+        from sklearn.pipeline import Pipeline
+
+        fill_values = [None] * len(self.columns)
+        for _, step in preprocessing.steps:
+            if isinstance(step, Pipeline):
+                step_fill_values = self.compile_preprocessing(step)
+            elif isinstance(step, SimpleImputer) and not step.add_indicator and isna(step.missing_values) \
+                    and len(step.statistics_) == len(self.columns):
+                step_fill_values = list(step.statistics_)
+            elif step is None or step == 'passthrough':
+                continue
+            else:
+                raise ValueError(f'Can not compile preprocessing step {step}')
+            # values are filled by the first imputer, the next ones do not see them missing
+            fill_values = [value if value is not None else fill for value, fill in zip(fill_values, step_fill_values)]
+        return fill_values
+
+    def predict(self, row: dict[str, str | float]) -> float:
+        """
+        Predicts attrition probability of a single employee
+        :param row: feature values by column, may contain extra columns
+        :return: attrition probability
+        """
+        if self.fill_values is None:
+            return float(predict_attrition(self.model, DataFrame({col: [row[col]] for col in self.columns}))[0])
+        values = []
+        for col, fill_value, is_categorical in zip(self.columns, self.fill_values, self.is_categorical):
+            value = row[col]
+            if fill_value is not None and isna(value):
+                value = fill_value
+            values.append(str(value) if is_categorical else float(value))
+        return float(self.model[-1].predict_proba(values)[1])
@@ -0,0 +1,214 @@
+"""
+Headless batch scoring service for nightly scoring of HR exports.
+
+POST /predict with a CSV (text/csv), Parquet (application/vnd.apache.parquet) or JSON lines
+(application/x-ndjson) body returns attrition probabilities, streamed batch by batch as CSV or JSON lines.
+The whole body is parsed before the response starts, so malformed input is rejected with 400. If scoring fails
+after the response has started, the body ends with a line starting with ERROR: instead of being truncated.
+Concurrent requests are micro-batched into shared predict_proba calls. Run with
+    uvicorn scoring_server:app --app-dir src/webapp
+The model is loaded when the module is imported, so with several workers started from a preloaded master, e.g.
+    gunicorn scoring_server:app --chdir src/webapp --preload -w 4 -k uvicorn.workers.UvicornWorker
+workers share its memory read-only instead of loading their own copies
+"""
+import asyncio
+import gc
+import os
+from collections.abc import Awaitable, Callable, Iterator
+from io import BytesIO
+
+import numpy as np
+import pyarrow.parquet as pq
+from pandas import DataFrame, Index, concat, read_csv, read_json
+from sklearn.pipeline import Pipeline
+
+import scoring
+from dataset_io import ID_COLUMN
+
+MODEL_PATH = os.environ.get('MODEL_PATH', 'models/CatBoostClassifier.pkl')
+BATCH_ROWS = int(os.environ.get('SCORING_BATCH_ROWS', 4096))
+MAX_WAIT_MS = float(os.environ.get('SCORING_MAX_WAIT_MS', 5))
+
+CSV_TYPE = 'text/csv'
+PARQUET_TYPE = 'application/vnd.apache.parquet'
+JSON_LINES_TYPE = 'application/x-ndjson'
+ERROR_MARKER = b'ERROR: '
+
+Scope = dict
+Receive = Callable[[], Awaitable[dict]]
+Send = Callable[[dict], Awaitable[None]]
+
+
+class MicroBatcher:
+    """
+    Collects features of concurrent requests into batches of up to max_batch_rows rows, waiting at most
+    max_wait seconds for the batch to fill, and scores every batch with a single predict call in a worker thread
+    """
+
+    def __init__(self, predict: Callable[[DataFrame], np.ndarray], max_batch_rows: int = BATCH_ROWS,
+                 max_wait: float = MAX_WAIT_MS / 1000) -> None:
+        self.predict_batch = predict
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue[tuple[DataFrame, asyncio.Future]] = asyncio.Queue()
+
+    async def predict(self, features: DataFrame) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((features, future))
+        return await future
+
+    async def _collect(self) -> list[tuple[DataFrame, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        items = [await self._queue.get()]
+        rows = len(items[0][0])
+        deadline = loop.time() + self.max_wait
+        while rows < self.max_batch_rows and (timeout := deadline - loop.time()) > 0:
+            try:
+                items.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except TimeoutError:
+                break
+            rows += len(items[-1][0])
+        return items
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            batch = concat([features for features, _ in items], ignore_index=True)
+            try:
+                probabilities = await loop.run_in_executor(None, self.predict_batch, batch)
+            except Exception as error:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            bounds = np.cumsum([len(features) for features, _ in items])[:-1]
+            for (_, future), result in zip(items, np.split(probabilities, bounds)):
+                if not future.done():
+                    future.set_result(result)
+
+
+class ScoringService:
+    def __init__(self, model_path: str = MODEL_PATH) -> None:
+        self.model_path = model_path
+        self.model: Pipeline | None = None
+        self.columns: Index | None = None
+        self.batcher: MicroBatcher | None = None
+        self._batcher_task: asyncio.Task | None = None
+
+    def load(self) -> None:
+        """
+        Loads the model and its columns unless they are loaded, then moves all the objects allocated so far
+        out of the garbage collector's reach, so forked workers do not copy the pages holding them
+        """
+        if self.model is not None:
+            return
+        self.model = scoring.load_model(self.model_path)
+        self.columns = scoring.get_model_columns(self.model_path, self.model)
+        gc.freeze()
+
+    def start(self) -> None:
+        self.load()
+        self.batcher = MicroBatcher(lambda features: scoring.predict_attrition(self.model, features))
+        self._batcher_task = asyncio.create_task(self.batcher.run())
+
+    def stop(self) -> None:
+        if self._batcher_task is not None:
+            self._batcher_task.cancel()
+
+    @staticmethod
+    def read_batches(body: bytes, content_type: str) -> Iterator[DataFrame]:
+        if content_type == CSV_TYPE:
+            yield from read_csv(BytesIO(body), chunksize=BATCH_ROWS)
+        elif content_type == JSON_LINES_TYPE:
+            yield from read_json(BytesIO(body), lines=True, chunksize=BATCH_ROWS)
+        elif content_type == PARQUET_TYPE:
+            for batch in pq.ParquetFile(BytesIO(body)).iter_batches(batch_size=BATCH_ROWS):
+                yield batch.to_pandas()
+        else:
+            raise ValueError(f'Content type should be one of {[CSV_TYPE, PARQUET_TYPE, JSON_LINES_TYPE]}')
+
+    @staticmethod
+    def format_results(ids: Index, probabilities: np.ndarray, as_json_lines: bool, header: bool) -> bytes:
+        results = DataFrame({ID_COLUMN: np.asarray(ids), scoring.RESULT_COLUMN: probabilities})
+        if as_json_lines:
+            return results.to_json(orient='records', lines=True).encode()
+        return results.to_csv(index=False, header=header).encode()
+
+    def read_features(self, body: bytes, content_type: str) -> list[tuple[Index, DataFrame]]:
+        """
+        Parses all batches of the body into row ids and model features
+        """
+        features = []
+        for batch in self.read_batches(body, content_type):
+            ids = Index(batch[ID_COLUMN]) if ID_COLUMN in batch.columns else batch.index
+            features.append((ids, scoring.prepare_features(batch, self.columns)))
+        return features
+
+    async def predict(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = dict(scope['headers'])
+        content_type = headers.get(b'content-type', CSV_TYPE.encode()).decode().split(';')[0].strip()
+        as_json_lines = content_type == JSON_LINES_TYPE
+        body = await read_body(receive)
+        try:
+            batches = await asyncio.to_thread(self.read_features, body, content_type)
+        except (ValueError, KeyError) as error:
+            await send_text(send, 400, str(error))
+            return
+        del body
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', (JSON_LINES_TYPE if as_json_lines else CSV_TYPE).encode())],
+        })
+        try:
+            for i, (ids, features) in enumerate(batches):
+                probabilities = await self.batcher.predict(features)
+                chunk = self.format_results(ids, probabilities, as_json_lines, header=i == 0)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        except Exception as error:
+            await send({'type': 'http.response.body', 'body': ERROR_MARKER + f'{error}\n'.encode()})
+            raise
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] != 'http':
+            return
+        elif scope['method'] == 'GET' and scope['path'] == '/health':
+            await send_text(send, 200, 'ok')
+        elif scope['method'] == 'POST' and scope['path'] == '/predict':
+            await self.predict(scope, receive, send)
+        else:
+            await send_text(send, 404, 'Not found')
+
+    async def lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def read_body(receive: Receive) -> bytes:
+    body = BytesIO()
+    while True:
+        message = await receive()
+        body.write(message.get('body', b''))
+        if not message.get('more_body', False):
+            return body.getvalue()
+
+
+async def send_text(send: Send, status: int, text: str) -> None:
+    await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'text/plain')]})
+    await send({'type': 'http.response.body', 'body': text.encode()})
+
+
+app = ScoringService()
+app.load()
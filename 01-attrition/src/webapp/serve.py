@@ -0,0 +1,17 @@
+"""
+Starts the Streamlit app after loading the shared registry, so the model is built at server boot instead of
+on the first page hit. Arguments are passed to streamlit run, e.g.
+    python src/webapp/serve.py --server.port 8501
+"""
+import sys
+from pathlib import Path
+
+from streamlit.web import cli
+
+from registry import get_registry
+
+if __name__ == '__main__':
+    # the registry is cached with st.cache_resource, which is shared by the sessions of this process
+    get_registry().warm_up()
+    sys.argv = ['streamlit', 'run', str(Path(__file__).parent / 'app.py'), *sys.argv[1:]]
+    sys.exit(cli.main())
@@ -0,0 +1,66 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import click
+import numpy as np
+import polars as pl
+import pyarrow.dataset as ds
+
+from src.data.to_parquet import DATE_FORMATS, DTYPES, using_arrow, using_dask, using_parquet
+
+CONVERTERS = {
+    'dask': (using_dask, 16),
+    'pa': (using_parquet, 2 ** 16 - 1),
+    'arrow': (using_arrow, 2 ** 17)
+}
+
+
+def make_train_csv(path: Path, rows: int, seed: int = 0) -> None:
+    '''
+    Writes a csv with the columns and value ranges of the train dataset
+    '''
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2013-01-01T00:00:00')
+    date_time = start + rng.integers(0, 2 * 365 * 24 * 3600, rows).astype('timedelta64[s]')
+    srch_ci = date_time.astype('datetime64[D]') + rng.integers(0, 90, rows).astype('timedelta64[D]')
+    srch_co = srch_ci + rng.integers(1, 14, rows).astype('timedelta64[D]')
+    columns = {
+        col: rng.integers(0, np.iinfo(dtype).max if dtype != 'uint32' else 1_200_000, rows)
+        for col, dtype in DTYPES.items() if dtype.startswith('uint')
+    }
+    columns.update({col: rng.integers(0, 2, rows) for col, dtype in DTYPES.items() if dtype == 'bool'})
+    columns['orig_destination_distance'] = np.where(rng.random(rows) < 0.3, np.nan, rng.exponential(2000, rows))
+    columns.update({'date_time': date_time.astype('datetime64[ms]'), 'srch_ci': srch_ci, 'srch_co': srch_co})
+    pl.DataFrame({col: columns[col] for col in DTYPES}).write_csv(
+        path, datetime_format=DATE_FORMATS['date_time'], date_format=DATE_FORMATS['srch_ci']
+    )
+
+
+def get_size(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.rglob('*') if file.is_file()) if path.is_dir() else path.stat().st_size
+
+
+@click.command()
+@click.option('--data-path', '-d', type=click.Path(exists=True), default=None, help='Generated when omitted')
+@click.option('--rows', '-r', type=click.INT, default=1_000_000)
+@click.option('--converter', '-c', type=click.Choice(list(CONVERTERS)), multiple=True, default=list(CONVERTERS))
+def main(data_path: str | None, rows: int, converter: list[str]) -> None:
+    with TemporaryDirectory() as directory:
+        if data_path is None:
+            data_path = str(Path(directory) / 'train.csv')
+            make_train_csv(Path(data_path), rows)
+        input_size = Path(data_path).stat().st_size
+        for name in converter:
+            function, n = CONVERTERS[name]
+            output_path = Path(directory) / name
+            start = perf_counter()
+            function(data_path, n, str(output_path))
+            elapsed = perf_counter() - start
+            count = ds.dataset(output_path, format='parquet').count_rows()
+            click.echo(f'{name:<6} rows={count:<10} time={elapsed:7.2f}s {count / elapsed:12.0f} rows/s '
+                       f'{input_size / elapsed / 2 ** 20:8.1f} MB/s size={get_size(output_path) / 2 ** 20:8.1f}MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
 from datetime import datetime
+from functools import partial
 
 import click
 import dask.dataframe as dd
 import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 import pyarrow.parquet as pq
 
 from pandas import read_csv
@@ -34,6 +37,13 @@ DTYPES = {
     'hotel_market': 'uint16',
     'hotel_cluster': 'uint8',
 }
+DATE_FORMATS = {
+    'date_time': '%Y-%m-%d %H:%M:%S',
+    'srch_ci': '%Y-%m-%d',
+    'srch_co': '%Y-%m-%d',
+}
+DICTIONARY_DTYPES = ['uint8', 'uint16']
+DATE_CHECK_ROWS = 10_000
 
 def get_pa_attribute(attr: str):
     if attr == 'bool':
@@ -72,26 +82,92 @@ def using_parquet(path: str, n: int, output_path: str) -> None:
     log('Done')
 
 
+def check_dates(dataset: ds.Dataset, columns: dict[str, ds.Expression]) -> None:
+    '''
+    Parses dates of the first rows, so a date format mismatch fails before the conversion instead of
+    silently turning the whole column into nulls
+    '''
+    sample = dataset.head(DATE_CHECK_ROWS, columns={
+        **{col: ds.field(col) for col in DATE_FORMATS}, **{f'parsed_{col}': columns[col] for col in DATE_FORMATS}
+    })
+    for col, date_format in DATE_FORMATS.items():
+        present = len(sample) - sample[col].null_count
+        assert present == 0 or sample[f'parsed_{col}'].null_count < len(sample), \
+            f'{col} values do not match {date_format}, e.g. {sample[col].drop_null()[0]}'
+
+
+def log_invalid_dates(output_path: str, rows: int) -> None:
+    dates = ds.dataset(output_path, format='parquet', partitioning='hive').to_table(columns=list(DATE_FORMATS))
+    for col in DATE_FORMATS:
+        log(f'{col}: {dates[col].null_count} of {rows} values are missing or invalid')
+
+
+def using_arrow(path: str | list[str], n: int, output_path: str, compression_level: int = 3,
+                partition: bool = True) -> None:
+    '''
+    Reads one or several csv files with the multithreaded Arrow reader and writes zstd-compressed row groups
+    of n rows. Dates are parsed to timestamps, invalid ones become nulls and are counted in the log. Output is
+    hive-partitioned by year and month of date_time, n rows are buffered per partition
+    '''
+    schema = get_pa_scheme()
+    dataset = ds.dataset(path, schema=schema, format='csv')
+    columns = {col: ds.field(col) for col in schema.names}
+    columns.update({
+        col: pc.strptime(ds.field(col), format=date_format, unit='s', error_is_null=True)
+        for col, date_format in DATE_FORMATS.items()
+    })
+    if partition:
+        columns['year'] = pc.year(columns['date_time']).cast(pa.uint16())
+        columns['month'] = pc.month(columns['date_time']).cast(pa.uint8())
+    check_dates(dataset, columns)
+    write_options = ds.ParquetFileFormat().make_write_options(
+        compression='zstd',
+        compression_level=compression_level,
+        use_dictionary=[col for col, dtype in DTYPES.items() if dtype in DICTIONARY_DTYPES]
+    )
+    log('Converting')
+    ds.write_dataset(
+        dataset.scanner(columns=columns),
+        output_path,
+        format='parquet',
+        file_options=write_options,
+        partitioning=['year', 'month'] if partition else None,
+        partitioning_flavor='hive',
+        min_rows_per_group=n,
+        max_rows_per_group=n
+    )
+    log_invalid_dates(output_path, dataset.count_rows())
+    log('Done')
+
+
 @click.command()
-@click.argument('df_path', type=click.Path(exists=True), required=True)
+@click.argument('df_paths', type=click.Path(exists=True), nargs=-1, required=True)
 @click.argument('output_path', type=click.Path(), required=True)
 @click.option('-n', type=click.INT, default=-1)
 @click.option('--converter', '-c', type=click.STRING, default='dask')
-def main(df_path: str, output_path: str, n: int,
-         converter: str) -> None:
-    if not df_path.endswith('.csv'):
-        print('1st argument df_path should be a csv file')
+@click.option('--compression-level', '-cl', type=click.INT, default=3)
+@click.option('--partition/--no-partition', default=True)
+def main(df_paths: tuple[str, ...], output_path: str, n: int,
+         converter: str, compression_level: int, partition: bool) -> None:
+    if not all(df_path.endswith('.csv') for df_path in df_paths):
+        print('df_paths should be csv files')
         return
 
     converters = {
         'dask': (using_dask, 16),
-        'pa': (using_parquet, 2 ** 16 - 1)
+        'pa': (using_parquet, 2 ** 16 - 1),
+        'arrow': (partial(using_arrow, compression_level=compression_level, partition=partition), 2 ** 17)
     }
 
     if converter not in converters:
         print(f'Converter should be one of {list(converters.keys())}')
         return
 
+    if converter != 'arrow' and len(df_paths) > 1:
+        print('Only arrow converter reads several files')
+        return
+    df_path = list(df_paths) if converter == 'arrow' else df_paths[0]
+
     log(f'Using {converter} as converter')
     converter, n_default = converters[converter]
     if n <= 0:
@@ -1,5 +1,5 @@
 from .pipeline import PipelineState, PipelineProcessor, FeatureExtractorPipeline, \
-                      AddColumns, DropColumns, Cast, ColumnSplitter
+                      AddColumns, DropColumns, Cast, ColumnSplitter, AutoDowncast, scan, collect
 
 __all__ = ['PipelineState', 'PipelineProcessor', 'FeatureExtractorPipeline', 'AddColumns', 
-           'DropColumns', 'Cast', 'ColumnSplitter']
+           'DropColumns', 'Cast', 'ColumnSplitter', 'AutoDowncast', 'scan', 'collect']
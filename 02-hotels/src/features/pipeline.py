@@ -1,39 +1,82 @@
+import json
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
+from io import StringIO
+from pathlib import Path
 
+import numpy as np
 import polars as pl
 
 
 DataFrame = pl.DataFrame
+LazyFrame = pl.LazyFrame
+Frame = DataFrame | LazyFrame
+
+
+POLARS_DTYPES = {
+    'string': pl.String,
+    'category': pl.Categorical,
+    'bool': pl.Boolean,
+    'int8': pl.Int8,
+    'int16': pl.Int16,
+    'int32': pl.Int32,
+    'int64': pl.Int64,
+    'uint8': pl.UInt8,
+    'uint16': pl.UInt16,
+    'uint32': pl.UInt32,
+    'uint64': pl.UInt64,
+    'float32': pl.Float32,
+    'float64': pl.Float64,
+    'date': pl.Date,
+    'datetime': pl.Datetime,
+    'duration': pl.Duration,
+    'time': pl.Time,
+    'null': pl.Null
+}
+INTEGER_DTYPES = ['uint8', 'int8', 'uint16', 'int16', 'uint32', 'int32', 'uint64', 'int64']
+# widths polars infers for columns without declared dtypes, narrower ones are declared on purpose
+DOWNCAST_DTYPES = {
+    'int64': ['int8', 'int16', 'int32', 'int64'],
+    'uint64': ['uint8', 'uint16', 'uint32', 'uint64'],
+}
+OVERFLOW_POLICIES = ['raise', 'null', 'clip']
+FLOAT32_MAX = float(np.finfo(np.float32).max)
 
 
 def map_to_polars(dtype: str):
-    conversion = {
-        'string': pl.String,
-        'uint8': pl.UInt8,
-        'uint16': pl.UInt16,
-        'uint32': pl.UInt32,
-        'int16': pl.Int16,
-        'int32': pl.Int32,
-        'float32': pl.Float32,
-        'bool': pl.UInt8 
-    }
-    return conversion[dtype]
+    assert dtype in POLARS_DTYPES, f'Unknown dtype: {dtype}'
+    return POLARS_DTYPES[dtype]
 
 
 def map_to_np(dtype):
-    conversion = {
-        pl.String: 'string',
-        pl.UInt8: 'uint8',
-        pl.UInt16: 'uint16',
-        pl.UInt32: 'uint32',
-        pl.Float32: 'float32',
-        pl.Int8: 'int8',
-        pl.Int16: 'int16',
-        pl.Int32: 'int32',
-        pl.Boolean: 'bool'
-    }
-    return conversion.get(dtype, 'datetime')
+    # enums are categoricals with fixed levels, the levels are not kept in the schema
+    conversion = {**{v: k for k, v in POLARS_DTYPES.items()}, pl.Enum: 'category'}
+    assert dtype.base_type() in conversion, f'Unsupported polars dtype: {dtype}'
+    return conversion[dtype.base_type()]
+
+
+def get_dtype_size(dtype: str) -> int:
+    return np.dtype(dtype).itemsize
+
+
+def scan(path: str, dtypes: dict[str, str] | None = None) -> LazyFrame:
+    '''
+    Lazily scans csv or parquet file, so the pipeline builds a single query plan over it
+    '''
+    if Path(path).suffix == '.parquet':
+        return pl.scan_parquet(path)
+    # flags are stored as 0/1 in csv, so they are read as integers
+    schema_overrides = {
+        k: pl.UInt8 if v == 'bool' else map_to_polars(v) for k, v in dtypes.items()
+    } if dtypes is not None else None
+    return pl.scan_csv(path, schema_overrides=schema_overrides)
+
+
+def collect(x: Frame) -> DataFrame:
+    '''
+    Materializes the frame with the streaming engine, so the query plan runs in bounded memory
+    '''
+    return x.collect(engine='streaming') if isinstance(x, LazyFrame) else x
 
 
 @dataclass
@@ -42,6 +85,35 @@ class PipelineState:
     numerical_columns: list[str] = field(default_factory=list)
     categorical_columns: list[str] = field(default_factory=list)
     numerical_categorical_columns: list[str] = field(default_factory=list)
+    n_unique: dict[str, int] = field(default_factory=dict)
+    null_counts: dict[str, int] = field(default_factory=dict)
+    min_values: dict[str, int | float] = field(default_factory=dict)
+    max_values: dict[str, int | float] = field(default_factory=dict)
+    n_rows: int = 0
+    saved_bytes: dict[str, int] = field(default_factory=dict)
+
+
+def profile_columns(x: Frame, state: PipelineState, approximate: bool = False) -> PipelineState:
+    '''
+    Records the number of rows, cardinality and null count of every column and min/max of numeric columns in a single query.
+    Approximate cardinality is estimated with HyperLogLog, see polars.Expr.approx_n_unique
+    '''
+    schema = x.collect_schema()
+    numeric = [col for col, dtype in schema.items() if dtype.is_numeric()]
+    statistics = collect(x.select(
+        *[(pl.col(col).approx_n_unique() if approximate else pl.col(col).n_unique()).alias(f'n_unique:{col}')
+          for col in schema.names()],
+        *[pl.col(col).null_count().alias(f'null_count:{col}') for col in schema.names()],
+        *[pl.col(col).min().alias(f'min:{col}') for col in numeric],
+        *[pl.col(col).max().alias(f'max:{col}') for col in numeric],
+        pl.len().alias('n_rows')
+    )).row(0, named=True)
+    state.n_rows = statistics['n_rows']
+    state.n_unique = {col: statistics[f'n_unique:{col}'] for col in schema.names()}
+    state.null_counts = {col: statistics[f'null_count:{col}'] for col in schema.names()}
+    state.min_values = {col: statistics[f'min:{col}'] for col in numeric}
+    state.max_values = {col: statistics[f'max:{col}'] for col in numeric}
+    return state
 
 
 class PipelineProcessor(ABC):
@@ -50,53 +122,123 @@ class PipelineProcessor(ABC):
     '''
 
     @abstractmethod
-    def fit_transform(self, x: DataFrame, state: PipelineState) -> tuple[DataFrame, PipelineState]:
+    def fit_transform(self, x: Frame, state: PipelineState) -> tuple[Frame, PipelineState]:
         pass
 
     @abstractmethod
-    def transform(self, x: DataFrame) -> DataFrame:
+    def transform(self, x: Frame) -> Frame:
         pass
 
+    def get_params(self) -> dict:
+        '''
+        JSON-serializable parameters and fitted attributes of the processor
+        '''
+        return vars(self).copy()
+
+    @classmethod
+    def from_params(cls, params: dict) -> 'PipelineProcessor':
+        processor = cls.__new__(cls)
+        processor.__dict__.update(params)
+        return processor
+
+
+def get_processor_types(base: type = PipelineProcessor) -> dict[str, type]:
+    types = {}
+    for subclass in base.__subclasses__():
+        types[subclass.__name__] = subclass
+        types.update(get_processor_types(subclass))
+    return types
+
 
 class FeatureExtractorPipeline:
-    def __init__(self, pipeline: list[PipelineProcessor]) -> None:
+    def __init__(self, pipeline: list[PipelineProcessor], state: PipelineState | None = None) -> None:
         self.pipeline = pipeline
+        self.state = state
 
-    def fit_transform(self, df: DataFrame) -> tuple[DataFrame, PipelineState]:
+    def fit_transform(self, df: Frame) -> tuple[Frame, PipelineState]:
+        '''
+        Fits the processors. For LazyFrame input processors extend one query plan, which is returned
+        without collecting, see collect
+        '''
         state = PipelineState(
             schema={
-                k: map_to_np(v) for k, v in df.schema.items()
+                k: map_to_np(v) for k, v in df.collect_schema().items()
             }
         )
         for processor in self.pipeline:
             df, state = processor.fit_transform(df, state)
+        self.state = state
         return df, state
 
+    def transform(self, df: Frame) -> Frame:
+        '''
+        Replays the fitted processors on new data
+        '''
+        assert self.state is not None, 'Pipeline should be fitted first'
+        for processor in self.pipeline:
+            df = processor.transform(df)
+        return df
+
+    def save(self, path: str | Path) -> None:
+        '''
+        Saves the fitted processors and the state as JSON
+        '''
+        assert self.state is not None, 'Pipeline should be fitted first'
+        Path(path).write_text(json.dumps({
+            'processors': [
+                {'type': type(processor).__name__, 'params': processor.get_params()} for processor in self.pipeline
+            ],
+            'state': asdict(self.state)
+        }))
+
+    @classmethod
+    def load(cls, path: str | Path) -> 'FeatureExtractorPipeline':
+        saved = json.loads(Path(path).read_text())
+        types = get_processor_types()
+        for processor in saved['processors']:
+            assert processor['type'] in types, f'Unknown processor type: {processor["type"]}'
+        return cls(
+            [types[processor['type']].from_params(processor['params']) for processor in saved['processors']],
+            PipelineState(**saved['state'])
+        )
+
 
 class AddColumns(PipelineProcessor):
     def __init__(self, expressions: dict[pl.expr, str]) -> None:
         self.expressions = expressions
     
-    def fit_transform(self, x: pl.DataFrame, state: PipelineState) -> tuple[DataFrame, PipelineState]:
+    def fit_transform(self, x: Frame, state: PipelineState) -> tuple[Frame, PipelineState]:
         for col, (_, dtype) in self.expressions.items():
             state.schema[col] = dtype
         return self.transform(x), state
     
-    def transform(self, x: pl.DataFrame) -> pl.DataFrame:
+    def transform(self, x: Frame) -> Frame:
         return x.with_columns(**{
             col: expr.cast(map_to_polars(dtype)) for col, (expr, dtype) in self.expressions.items() 
         })
 
+    def get_params(self) -> dict:
+        return {'expressions': {
+            col: [expr.meta.serialize(format='json'), dtype] for col, (expr, dtype) in self.expressions.items()
+        }}
+
+    @classmethod
+    def from_params(cls, params: dict) -> 'AddColumns':
+        return cls({
+            col: (pl.Expr.deserialize(StringIO(expr), format='json'), dtype)
+            for col, (expr, dtype) in params['expressions'].items()
+        })
+
 
 class DropColumns(PipelineProcessor):
     def __init__(self, columns: list[str]) -> None:
         self.columns = columns
 
-    def fit_transform(self, x: pl.DataFrame, state: PipelineState) -> tuple[DataFrame, PipelineState]:
+    def fit_transform(self, x: Frame, state: PipelineState) -> tuple[Frame, PipelineState]:
         state.schema = {k: v for k, v in state.schema.items() if k not in self.columns}
         return self.transform(x), state
     
-    def transform(self, x: pl.DataFrame) -> pl.DataFrame:
+    def transform(self, x: Frame) -> Frame:
         return x.drop(*self.columns)
 
 
@@ -104,41 +246,98 @@ class Cast(PipelineProcessor):
     def __init__(self, to: dict[str, str]) -> None:
         self.to = to
     
-    def fit_transform(self, x: pl.DataFrame, state: PipelineState) -> tuple[DataFrame, PipelineState]:
+    def fit_transform(self, x: Frame, state: PipelineState) -> tuple[Frame, PipelineState]:
         for col, dtype in self.to.items():
             state.schema[col] = dtype
         return self.transform(x), state
     
-    def transform(self, x: pl.DataFrame) -> pl.DataFrame:
+    def transform(self, x: Frame) -> Frame:
         return x.with_columns(**{
             col: pl.col(col).cast(map_to_polars(dtype)) for col, dtype in self.to.items()   
         })
 
 
 class ColumnSplitter(PipelineProcessor):
-    def __init__(self, num_cat_threshold: int = 0) -> None:
+    def __init__(self, num_cat_threshold: int = 0, approximate: bool = False) -> None:
         self.threshold = num_cat_threshold
+        self.approximate = approximate
         self.numerical_categorical = []
         self.categorical = []
         self.numerical = []
     
-    def fit_transform(self, x: pl.DataFrame, state: PipelineState) -> tuple[DataFrame, PipelineState]:
-        state.numerical_categorical_columns = [
-            col for col in x.columns
-            if x[col].dtype not in [pl.Boolean, pl.String, pl.Datetime] and x[col].n_unique() < self.threshold
-        ]
+    def fit_transform(self, x: Frame, state: PipelineState) -> tuple[Frame, PipelineState]:
+        schema = x.collect_schema()
+        state = profile_columns(x, state, self.approximate)
+        numeric = {col for col in schema.names() if schema[col].is_numeric()}
+        numerical_categorical = {col for col in numeric if state.n_unique[col] < self.threshold}
+        state.numerical_categorical_columns = [col for col in schema.names() if col in numerical_categorical]
         state.numerical_columns = [
-            col for col in x.columns
-            if x[col].dtype not in [pl.Boolean, pl.String, pl.Datetime] and col not in state.numerical_categorical_columns
-        ]
-        state.categorical_columns = [
-            col for col in x.columns
-            if col not in state.numerical_columns and col not in state.numerical_categorical_columns
+            col for col in schema.names() if col in numeric and col not in numerical_categorical
         ]
+        state.categorical_columns = [col for col in schema.names() if col not in numeric]
         self.numerical_categorical = state.numerical_categorical_columns.copy()
         self.categorical = state.categorical_columns.copy()
         self.numerical = state.numerical_columns.copy()
         return self.transform(x), state
     
-    def transform(self, x: pl.DataFrame) -> pl.DataFrame:
+    def transform(self, x: Frame) -> Frame:
         return x
+
+
+class AutoDowncast(PipelineProcessor):
+    '''
+    Casts int64 and uint64 columns to the narrowest integer type of the same signedness holding their observed
+    range, float64 columns to float32 when the range fits and string columns with at most max_categories values
+    to category. Columns of other dtypes are declared on purpose and kept. New batches may exceed the fitted
+    range, overflow sets what transform does with such values: raise an error, replace them with nulls or clip
+    them to the bounds of the dtype. Saved memory of the numeric columns is estimated in PipelineState.saved_bytes
+    '''
+
+    def __init__(self, max_categories: int = 255, downcast_floats: bool = True, approximate: bool = False,
+                 overflow: str = 'raise') -> None:
+        assert overflow in OVERFLOW_POLICIES, f'Overflow should be one of {OVERFLOW_POLICIES}'
+        self.max_categories = max_categories
+        self.downcast_floats = downcast_floats
+        self.approximate = approximate
+        self.overflow = overflow
+        self.to = {}
+
+    def get_target_dtype(self, col: str, dtype: str, state: PipelineState) -> str:
+        min_value, max_value = state.min_values.get(col), state.max_values.get(col)
+        if dtype == 'string' and state.n_unique[col] <= self.max_categories:
+            return 'category'
+        if min_value is None or max_value is None:
+            return dtype
+        for target in DOWNCAST_DTYPES.get(dtype, []):
+            info = np.iinfo(target)
+            if info.min <= min_value and max_value <= info.max:
+                return target
+        if dtype == 'float64' and self.downcast_floats and max(-min_value, max_value) <= FLOAT32_MAX:
+            return 'float32'
+        return dtype
+
+    def fit_transform(self, x: Frame, state: PipelineState) -> tuple[Frame, PipelineState]:
+        state = profile_columns(x, state, self.approximate)
+        schema = {col: map_to_np(dtype) for col, dtype in x.collect_schema().items()}
+        self.to = {}
+        for col, dtype in schema.items():
+            target = self.get_target_dtype(col, dtype, state)
+            if target == dtype:
+                continue
+            self.to[col] = target
+            state.schema[col] = target
+            if target != 'category':
+                state.saved_bytes[col] = state.n_rows * (get_dtype_size(dtype) - get_dtype_size(target))
+        return self.transform(x), state
+
+    def cast(self, col: str, dtype: str) -> pl.Expr:
+        expr = pl.col(col)
+        if self.overflow == 'clip' and dtype in INTEGER_DTYPES:
+            info = np.iinfo(dtype)
+            expr = expr.clip(int(info.min), int(info.max))
+        elif self.overflow == 'clip' and dtype == 'float32':
+            expr = expr.clip(-FLOAT32_MAX, FLOAT32_MAX)
+        return expr.cast(map_to_polars(dtype), strict=self.overflow == 'raise')
+
+    def transform(self, x: Frame) -> Frame:
+        return x.with_columns(**{col: self.cast(col, dtype) for col, dtype in self.to.items()})
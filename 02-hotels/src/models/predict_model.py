@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import click
+import polars as pl
+
+from src.data.to_parquet import DTYPES
+from src.features import FeatureExtractorPipeline, scan
+
+DATETIME_COLUMNS = ['date_time', 'srch_ci', 'srch_co']
+BOOLEAN_COLUMNS = ['is_booking', 'is_mobile', 'is_package']
+
+
+def log(message: str) -> None:
+    click.echo(f'[{datetime.now():%H:%M:%S}] {message}')
+
+
+def read_batch(path: str) -> pl.LazyFrame:
+    '''
+    Scans the batch and parses datetime and boolean columns the same way as the training data
+    '''
+    df = scan(path, DTYPES)
+    schema = df.collect_schema()
+    return df.with_columns(
+        *[pl.col(col).str.to_datetime() for col in DATETIME_COLUMNS if schema.get(col) == pl.String],
+        *[pl.col(col) == 1 for col in BOOLEAN_COLUMNS if col in schema and schema[col] != pl.Boolean]
+    )
+
+
+@click.command()
+@click.argument('pipeline_path', type=click.Path(exists=True), required=True)
+@click.argument('df_path', type=click.Path(exists=True), required=True)
+@click.argument('output_path', type=click.Path(), required=True)
+def main(pipeline_path: str, df_path: str, output_path: str) -> None:
+    '''
+    Transforms a new batch with the saved fitted feature pipeline and writes features to parquet
+    '''
+    log('Loading the pipeline')
+    pipeline = FeatureExtractorPipeline.load(pipeline_path)
+    log('Transforming the batch')
+    pipeline.transform(read_batch(df_path)).sink_parquet(output_path)
+    log('Done')